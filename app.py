@@ -2,20 +2,42 @@ from flask import Flask
 from config import Config
 from models import db
 from routes import api
-from flask_migrate import Migrate
+from services.password_hasher import password_hasher
+from services.events import event_bus
+from services.document_cache import document_cache
+from services.identity import identity_cache
+from services.query_monitor import query_monitor
+from services.metrics import metrics
+from cli import register_commands
+from json_provider import init_json_provider
+from services.database import init_database
+from services.replicas import replica_router
 
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    init_json_provider(app)
 
+    init_database(app)
+    replica_router.init_app(app)
     db.init_app(app)
-    Migrate(app, db)
 
-    app.register_blueprint(api)
+    if app.config.get("MIGRATIONS_ENABLED", True):
+        # Flask-Migrate pulls in alembic, only the `flask db` commands need it
+        from flask_migrate import Migrate
+
+        Migrate(app, db, render_as_batch=True)
 
-    with app.app_context():
-        db.create_all()
+    password_hasher.init_app(app)
+    event_bus.init_app(app)
+    document_cache.init_app(app)
+    identity_cache.init_app(app)
+    query_monitor.init_app(app)
+    metrics.init_app(app)
+
+    app.register_blueprint(api)
+    register_commands(app)
 
     return app
 
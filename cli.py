@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+import signal
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from models import db
+from services.database import lift_statement_timeout
+from services.job_worker import JobWorker
+from services.shop_list_service import ShopListService
+
+tombstones_cli = AppGroup("tombstones", help="Manage delta sync tombstones")
+shoplists_cli = AppGroup("shoplists", help="Manage shop lists")
+jobs_cli = AppGroup("jobs", help="Run background jobs")
+
+
+@tombstones_cli.command("compact")
+@click.option(
+    "--days",
+    type=int,
+    default=None,
+    help="Remove tombstones older than this many days (TOMBSTONE_RETENTION_DAYS)",
+)
+@click.option(
+    "--background", is_flag=True, help="Queue the compaction for the job worker"
+)
+def compact_tombstones(days, background):
+    """
+    Prune old tombstones of deleted products and shares
+    """
+    if days is None:
+        days = current_app.config["TOMBSTONE_RETENTION_DAYS"]
+
+    if background:
+        job = ShopListService.compact_tombstones_later(days)
+        if job is None:
+            raise click.ClickException("Failed to queue tombstone compaction")
+        click.echo(f"Queued job {job.id}")
+        return
+
+    lift_statement_timeout(db.engine)
+    removed = ShopListService.compact_tombstones(
+        datetime.utcnow() - timedelta(days=days)
+    )
+    click.echo(f"Removed {removed} tombstones older than {days} days")
+
+
+@shoplists_cli.command("purge")
+@click.option(
+    "--batch-size",
+    type=int,
+    default=None,
+    help="Rows deleted per transaction (LIST_PURGE_BATCH_SIZE)",
+)
+def purge_shop_lists(batch_size):
+    """
+    Remove soft-deleted shop lists and everything in them
+    """
+    if batch_size is None:
+        batch_size = current_app.config["LIST_PURGE_BATCH_SIZE"]
+    lift_statement_timeout(db.engine)
+
+    purged = ShopListService.purge_deleted_shop_lists(batch_size)
+    click.echo(f"Purged {purged} deleted shop lists")
+
+
+@shoplists_cli.command("recount")
+@click.option(
+    "--batch-size", type=int, default=1000, help="Lists updated per transaction"
+)
+def recount_products(batch_size):
+    """
+    Recompute the product counters of all shop lists and fix any drift
+    """
+    lift_statement_timeout(db.engine)
+    corrected = ShopListService.recount_products(batch_size)
+    click.echo(f"Corrected the product counts of {corrected} shop lists")
+
+
+@jobs_cli.command("worker")
+@click.option(
+    "--concurrency",
+    type=int,
+    default=None,
+    help="Jobs run in parallel (JOB_WORKER_CONCURRENCY)",
+)
+@click.option("--burst", is_flag=True, help="Exit once the queue is empty")
+def run_job_worker(concurrency, burst):
+    """
+    Run queued background jobs until interrupted
+    """
+    if concurrency is None:
+        concurrency = current_app.config["JOB_WORKER_CONCURRENCY"]
+
+    worker = JobWorker(
+        current_app._get_current_object(),
+        concurrency=concurrency,
+        poll_interval=current_app.config["JOB_POLL_INTERVAL"],
+        burst=burst,
+    )
+    # Finish the jobs in progress on shutdown instead of abandoning them
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: worker.stop())
+
+    click.echo(f"Job worker {worker.name} running {concurrency} jobs at a time")
+    worker.run()
+
+
+def register_commands(app):
+    app.cli.add_command(tombstones_cli)
+    app.cli.add_command(shoplists_cli)
+    app.cli.add_command(jobs_cli)
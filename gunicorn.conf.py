@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+
+
+def _cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Requests mostly wait on the database, so each worker serves several of them
+# on threads; bcrypt runs on its own pool. The app sizes its connection pool
+# from the same variables (see Config), so they are exported before it loads
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("WEB_CONCURRENCY", max(2, _cpu_count())))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+os.environ["WEB_CONCURRENCY"] = str(workers)
+os.environ["GUNICORN_THREADS"] = str(threads)
+
+# Event streams stay open while a client watches a list, so the proxy routes
+# /api/shoplists/<id>/events to a second server started with
+# GUNICORN_WORKER_CLASS=gevent. There every stream is a greenlet waiting on
+# its queue, and the process only holds its one LISTEN connection for them
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+# Import the app once in the master and fork it into every worker. Workers
+# never touch the schema (run `flask db upgrade` before starting) and do not
+# need the migration tooling. gevent patches the standard library when a
+# worker starts, so the evented server loads the app in each worker instead
+preload_app = worker_class != "gevent"
+os.environ.setdefault("MIGRATIONS_ENABLED", "false")
+
+# Recycle workers now and then to bound memory growth, with jitter so they do
+# not all restart at once
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Metrics are collected per worker in files under PROMETHEUS_MULTIPROC_DIR and
+# aggregated by whichever worker serves /metrics. The directory has to exist
+# before the app (and prometheus_client) is imported
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "shoplist-metrics")
+)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+def on_starting(server):
+    # Samples left by a previous run would be added to the new ones
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def post_worker_init(worker):
+    # Connections opened by the master must not be shared with the workers
+    from models import db
+
+    with worker.wsgi.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
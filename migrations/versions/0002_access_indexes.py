@@ -0,0 +1,55 @@
+"""indexes for accessible shop list lookups
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop duplicate shares left behind by concurrent share requests before
+    # the unique constraint is added
+    op.execute(
+        "DELETE FROM shop_list_shares WHERE id NOT IN ("
+        "SELECT MIN(id) FROM shop_list_shares GROUP BY shop_list_id, user_id)"
+    )
+
+    op.create_index("ix_shop_lists_owner_id", "shop_lists", ["owner_id"], unique=False)
+    op.create_index(
+        "ix_products_shop_list_id_created_at",
+        "products",
+        ["shop_list_id", "created_at"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_shop_list_shares_user_id_shop_list_id",
+        "shop_list_shares",
+        ["user_id", "shop_list_id"],
+        unique=False,
+    )
+    with op.batch_alter_table("shop_list_shares") as batch_op:
+        batch_op.create_unique_constraint(
+            "uq_shop_list_shares_shop_list_id_user_id", ["shop_list_id", "user_id"]
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("shop_list_shares") as batch_op:
+        batch_op.drop_constraint(
+            "uq_shop_list_shares_shop_list_id_user_id", type_="unique"
+        )
+    op.drop_index(
+        "ix_shop_list_shares_user_id_shop_list_id", table_name="shop_list_shares"
+    )
+    op.drop_index("ix_products_shop_list_id_created_at", table_name="products")
+    op.drop_index("ix_shop_lists_owner_id", table_name="shop_lists")
@@ -0,0 +1,68 @@
+"""row versions and tombstones for delta sync
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("shop_lists") as batch_op:
+        batch_op.add_column(
+            sa.Column(
+                "pruned_version", sa.Integer(), server_default="0", nullable=False
+            )
+        )
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.add_column(
+            sa.Column("version", sa.Integer(), server_default="0", nullable=False)
+        )
+    with op.batch_alter_table("shop_list_shares") as batch_op:
+        batch_op.add_column(
+            sa.Column("version", sa.Integer(), server_default="0", nullable=False)
+        )
+
+    op.create_table(
+        "tombstones",
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("shop_list_id", sa.String(length=36), nullable=False),
+        sa.Column("kind", sa.String(length=16), nullable=False),
+        sa.Column("entity_id", sa.String(length=36), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["shop_list_id"], ["shop_lists.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_tombstones_shop_list_id_version",
+        "tombstones",
+        ["shop_list_id", "version"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_tombstones_created_at", "tombstones", ["created_at"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index("ix_tombstones_created_at", table_name="tombstones")
+    op.drop_index("ix_tombstones_shop_list_id_version", table_name="tombstones")
+    op.drop_table("tombstones")
+
+    with op.batch_alter_table("shop_list_shares") as batch_op:
+        batch_op.drop_column("version")
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.drop_column("version")
+    with op.batch_alter_table("shop_lists") as batch_op:
+        batch_op.drop_column("pruned_version")
@@ -0,0 +1,58 @@
+"""cascade shop list deletes in the database, soft-deleted lists
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+CHILD_TABLES = ("products", "shop_list_shares", "tombstones")
+
+# The foreign keys were created unnamed. PostgreSQL named them itself; on
+# SQLite batch mode names the reflected constraints with this convention
+naming_convention = {
+    "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
+}
+
+
+def _replace_shop_list_fk(table, ondelete):
+    if op.get_bind().dialect.name == "sqlite":
+        name = f"fk_{table}_shop_list_id_shop_lists"
+        batch_args = {"naming_convention": naming_convention}
+    else:
+        name = f"{table}_shop_list_id_fkey"
+        batch_args = {}
+
+    with op.batch_alter_table(table, **batch_args) as batch_op:
+        batch_op.drop_constraint(name, type_="foreignkey")
+        batch_op.create_foreign_key(
+            name, "shop_lists", ["shop_list_id"], ["id"], ondelete=ondelete
+        )
+
+
+def upgrade():
+    for table in CHILD_TABLES:
+        _replace_shop_list_fk(table, "CASCADE")
+
+    with op.batch_alter_table("shop_lists") as batch_op:
+        batch_op.add_column(sa.Column("deleted_at", sa.DateTime(), nullable=True))
+        batch_op.create_index("ix_shop_lists_deleted_at", ["deleted_at"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("shop_lists") as batch_op:
+        batch_op.drop_index("ix_shop_lists_deleted_at")
+        batch_op.drop_column("deleted_at")
+
+    for table in CHILD_TABLES:
+        _replace_shop_list_fk(table, None)
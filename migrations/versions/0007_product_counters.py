@@ -0,0 +1,42 @@
+"""product counters on shop lists
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("shop_lists") as batch_op:
+        batch_op.add_column(
+            sa.Column("product_count", sa.Integer(), server_default="0", nullable=False)
+        )
+        batch_op.add_column(
+            sa.Column("open_count", sa.Integer(), server_default="0", nullable=False)
+        )
+
+    op.execute(
+        "UPDATE shop_lists SET "
+        "product_count = (SELECT count(*) FROM products "
+        "WHERE products.shop_list_id = shop_lists.id), "
+        "open_count = (SELECT count(*) FROM products "
+        "WHERE products.shop_list_id = shop_lists.id "
+        "AND products.strikeout IS NOT true)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("shop_lists") as batch_op:
+        batch_op.drop_column("open_count")
+        batch_op.drop_column("product_count")
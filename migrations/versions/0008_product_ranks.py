@@ -0,0 +1,98 @@
+"""product ranks for manual ordering
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+RANK_TYPE = sa.String(length=255).with_variant(
+    sa.String(length=255, collation="C"), "postgresql"
+)
+
+
+def _spread_ranks(count):
+    # Copy of services.ranks.spread_ranks, so this migration keeps producing
+    # the same ranks if that module changes
+    base = len(DIGITS)
+    width = 6
+    while base**width < (count + 1) * base:
+        width += 1
+
+    step = base**width // (count + 1)
+    ranks = []
+    for index in range(count):
+        value = step * (index + 1)
+        digits = []
+        for _ in range(width):
+            value, digit = divmod(value, base)
+            digits.append(DIGITS[digit])
+        ranks.append("".join(reversed(digits)).rstrip("0"))
+    return ranks
+
+
+def upgrade():
+    op.add_column("products", sa.Column("rank", RANK_TYPE, nullable=True))
+
+    # Existing products keep their creation order
+    bind = op.get_bind()
+    products = sa.table(
+        "products",
+        sa.column("id"),
+        sa.column("shop_list_id"),
+        sa.column("created_at"),
+        sa.column("rank"),
+    )
+    shop_list_ids = (
+        bind.execute(sa.select(products.c.shop_list_id).distinct()).scalars().all()
+    )
+    for shop_list_id in shop_list_ids:
+        product_ids = (
+            bind.execute(
+                sa.select(products.c.id)
+                .where(products.c.shop_list_id == shop_list_id)
+                .order_by(products.c.created_at, products.c.id)
+            )
+            .scalars()
+            .all()
+        )
+        bind.execute(
+            products.update()
+            .where(products.c.id == sa.bindparam("product_id"))
+            .values(rank=sa.bindparam("new_rank")),
+            [
+                {"product_id": product_id, "new_rank": rank}
+                for product_id, rank in zip(
+                    product_ids, _spread_ranks(len(product_ids))
+                )
+            ],
+        )
+
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.alter_column("rank", existing_type=RANK_TYPE, nullable=False)
+        batch_op.drop_index("ix_products_shop_list_id_created_at")
+        batch_op.create_index(
+            "ix_products_shop_list_id_rank", ["shop_list_id", "rank"], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.drop_index("ix_products_shop_list_id_rank")
+        batch_op.create_index(
+            "ix_products_shop_list_id_created_at",
+            ["shop_list_id", "created_at"],
+            unique=False,
+        )
+        batch_op.drop_column("rank")
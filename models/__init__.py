@@ -1,3 +1,4 @@
 from flask_sqlalchemy import SQLAlchemy
+from models.routing_session import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession, "expire_on_commit": False})
@@ -0,0 +1,26 @@
+from flask import current_app
+from flask_sqlalchemy.session import Session
+
+
+class RoutingSession(Session):
+    """
+    Session that sends the reads of read-only requests to a replica
+    A request opts in by setting info["read_only"] (see routes.read_only).
+    Flushes, writes and every statement after the first write of the session
+    go to the primary, and so does everything when no replica is configured
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and self.info.get("read_only")
+            and not self.info.get("wrote")
+            and not self._flushing
+            and (clause is None or getattr(clause, "is_select", False))
+        ):
+            router = current_app.extensions.get("replica_router")
+            engine = router.engine_for(self) if router is not None else None
+            if engine is not None:
+                return engine
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
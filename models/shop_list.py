@@ -14,40 +14,76 @@ class ShopList(db.Model):
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = db.Column(db.String(100), nullable=False)
-    owner_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False)
+    owner_id = db.Column(
+        db.String(36), db.ForeignKey("users.id"), nullable=False, index=True
+    )
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    pruned_version = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    product_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    open_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
+    deleted_at = db.Column(db.DateTime, nullable=True, index=True)
 
     owner = db.relationship("User", backref=db.backref("owned_shop_lists", lazy=True))
     products = db.relationship(
-        "Product", backref="shop_list", lazy=True, cascade="all, delete-orphan"
+        "Product",
+        backref="shop_list",
+        lazy=True,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="[Product.rank, Product.id]",
     )
     shared_with = db.relationship(
-        "ShopListShare", backref="shop_list", lazy=True, cascade="all, delete-orphan"
+        "ShopListShare",
+        backref="shop_list",
+        lazy=True,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="[ShopListShare.created_at, ShopListShare.id]",
+    )
+    tombstones = db.relationship(
+        "Tombstone", lazy=True, cascade="all, delete-orphan", passive_deletes=True
     )
 
-    def to_dict(self):
-        return {
+    def to_dict(self, include_products=True):
+        data = {
             "id": self.id,
             "name": self.name,
             "access": Access.Write,
             "ownerId": self.owner_id,
             "sharedWith": [share.to_dict() for share in self.shared_with],
-            "products": [product.to_dict() for product in self.products],
         }
+        if include_products:
+            data["products"] = [product.to_dict() for product in self.products]
+        return data
 
 
 class Product(db.Model):
     __tablename__ = "products"
+    __table_args__ = (
+        db.Index("ix_products_shop_list_id_rank", "shop_list_id", "rank"),
+    )
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = db.Column(db.String(100), nullable=False)
     strikeout = db.Column(db.Boolean, default=False)
     shop_list_id = db.Column(
-        db.String(36), db.ForeignKey("shop_lists.id"), nullable=False
+        db.String(36),
+        db.ForeignKey("shop_lists.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    # Position in the list, see services/ranks.py. Compared byte by byte so
+    # PostgreSQL sorts ranks the same way Python does
+    rank = db.Column(
+        db.String(255).with_variant(db.String(255, collation="C"), "postgresql"),
+        nullable=False,
     )
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
@@ -59,13 +95,22 @@ class Product(db.Model):
 
 class ShopListShare(db.Model):
     __tablename__ = "shop_list_shares"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "shop_list_id", "user_id", name="uq_shop_list_shares_shop_list_id_user_id"
+        ),
+        db.Index("ix_shop_list_shares_user_id_shop_list_id", "user_id", "shop_list_id"),
+    )
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     shop_list_id = db.Column(
-        db.String(36), db.ForeignKey("shop_lists.id"), nullable=False
+        db.String(36),
+        db.ForeignKey("shop_lists.id", ondelete="CASCADE"),
+        nullable=False,
     )
     user_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False)
     access = db.Column(db.Integer, default=Access.Read.value, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
@@ -75,3 +120,29 @@ class ShopListShare(db.Model):
 
     def to_dict(self):
         return {"username": self.user.username, "access": Access(self.access)}
+
+
+class Tombstone(db.Model):
+    """
+    Record of a product or share removed from a shop list, kept so delta sync
+    clients can learn about deletions until the tombstone is compacted
+    """
+
+    __tablename__ = "tombstones"
+    __table_args__ = (
+        db.Index("ix_tombstones_shop_list_id_version", "shop_list_id", "version"),
+    )
+
+    PRODUCT = "product"
+    SHARE = "share"
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    shop_list_id = db.Column(
+        db.String(36),
+        db.ForeignKey("shop_lists.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    kind = db.Column(db.String(16), nullable=False)
+    entity_id = db.Column(db.String(36), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -1,8 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import uuid
-import bcrypt
 from models import db
+from services.password_hasher import password_hasher
 
 
 class User(db.Model):
@@ -17,14 +17,13 @@ class User(db.Model):
     )
 
     def set_password(self, password):
-        password_bytes = password.encode()
-        salt = bcrypt.gensalt()
-        self.password_hash = bcrypt.hashpw(password_bytes, salt).decode()
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        password_bytes = password.encode()
-        hash_bytes = self.password_hash.encode()
-        return bcrypt.checkpw(password_bytes, hash_bytes)
+        return password_hasher.verify(password, self.password_hash)
+
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
 
     def to_dict(self):
         return {
@@ -5,3 +5,5 @@ api = Blueprint("api", __name__)
 from routes.auth_routes import *
 from routes.shop_list_routes import *
 from routes.product_routes import *
+from routes.job_routes import *
+from routes.metrics_routes import *
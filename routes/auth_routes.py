@@ -1,6 +1,15 @@
-from flask import request, jsonify, session
+from flask import g, request, jsonify, session
 from routes import api, login_required
 from services.user_service import UserService
+from services.password_hasher import PasswordHasherBusy
+
+
+@api.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(error):
+    response = jsonify({"error": "Server is busy, please try again later"})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
 
 
 @api.route("/api/register", methods=["POST"])
@@ -60,12 +69,4 @@ def get_current_user():
     Returns the currently authenticated user's information.
     Requires the user to be logged in (authenticated).
     """
-    user_id = session.get("user_id")
-
-    user = UserService.get_user_by_id(user_id)
-
-    if not user:
-        session.clear()
-        return jsonify({"error": "User not found"}), 404
-
-    return jsonify({"id": user.id, "username": user.username}), 200
+    return jsonify(g.current_user), 200
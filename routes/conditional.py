@@ -0,0 +1,25 @@
+from flask import request, make_response
+
+
+def is_not_modified(etag):
+    """
+    Whether the request's If-None-Match header matches the given strong ETag
+    """
+    return request.if_none_match.contains(etag)
+
+
+def not_modified(etag):
+    """
+    Build an empty 304 response carrying the ETag
+    """
+    response = make_response("", 304)
+    response.set_etag(etag)
+    return response
+
+
+def with_etag(response, etag):
+    """
+    Attach a strong ETag to a response
+    """
+    response.set_etag(etag)
+    return response
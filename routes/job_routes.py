@@ -0,0 +1,20 @@
+from flask import g, jsonify
+from routes import api
+from services.job_service import JobService
+from routes.login_required import login_required
+
+
+@api.route("/api/jobs/<job_id>", methods=["GET"])
+@login_required
+def get_job(job_id):
+    """
+    Get the status of a background job started by the current user
+    """
+    user_id = g.current_user["id"]
+
+    job = JobService.get_job(job_id)
+
+    if not job or job.owner_id != user_id:
+        return jsonify({"error": "Job not found"}), 404
+
+    return jsonify(job.to_dict()), 200
@@ -1,12 +1,26 @@
 from functools import wraps
-from flask import session, jsonify
+from flask import g, session, jsonify
+from services.user_service import UserService
 
 
 def login_required(f):
+    """
+    Require a logged in user whose account still exists
+    The user is resolved once per request and exposed as g.current_user
+    """
+
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if "user_id" not in session:
             return jsonify({"error": "Authentication required"}), 401
+
+        current_user = UserService.get_user_identity(session["user_id"])
+
+        if current_user is None:
+            session.clear()
+            return jsonify({"error": "Authentication required"}), 401
+
+        g.current_user = current_user
         return f(*args, **kwargs)
 
     return decorated_function
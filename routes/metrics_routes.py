@@ -0,0 +1,16 @@
+from flask import Response
+from routes import api
+from services.metrics import metrics
+
+
+@api.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Export request, connection pool, document cache and password hashing
+    metrics in the Prometheus text format
+    """
+    if not metrics.enabled:
+        return "", 404
+
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
@@ -0,0 +1,44 @@
+from datetime import datetime
+from flask import request
+from services.pagination import decode_cursor
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def is_paged_request():
+    """
+    Whether the client asked for a paginated response
+    Clients that send neither limit nor cursor keep getting plain arrays
+    """
+    return "limit" in request.args or "cursor" in request.args
+
+
+def get_page_args(key_type=datetime):
+    """
+    Read the limit and cursor query parameters
+    key_type is the type of the sort key the cursor must carry
+    Returns a (limit, cursor, error) tuple, error is None if they are valid
+    """
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return None, None, "Field limit must be an integer"
+
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return None, None, f"Field limit must be between 1 and {MAX_PAGE_SIZE}"
+
+    cursor = request.args.get("cursor")
+
+    if cursor:
+        try:
+            cursor = decode_cursor(cursor)
+        except ValueError:
+            return None, None, "Invalid cursor"
+
+        if not isinstance(cursor[0], key_type):
+            return None, None, "Invalid cursor"
+    else:
+        cursor = None
+
+    return limit, cursor, None
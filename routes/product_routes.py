@@ -1,9 +1,89 @@
-from flask import request, jsonify, session
+from flask import g, request, jsonify
 from routes import api
+from services.product_io import MAX_NAME_LENGTH
 from services.product_service import ProductService
 from services.shop_list_service import ShopListService
 from models.shop_list import Access
 from routes.login_required import login_required
+from routes.read_only import read_only
+from routes.conditional import is_not_modified, not_modified, with_etag
+from routes.pagination import get_page_args, is_paged_request
+
+MAX_BATCH_SIZE = 500
+
+
+def _check_name(name):
+    """
+    Validate a product name
+    Returns an error message, None if the name is valid
+    """
+    if not isinstance(name, str) or not name.strip():
+        return "Product name cannot be empty"
+
+    if len(name) > MAX_NAME_LENGTH:
+        return f"Product name is longer than {MAX_NAME_LENGTH} characters"
+
+    return None
+
+
+def _parse_new_product(data):
+    """
+    Validate the payload of a product create
+    Returns a (name, error) tuple, error is None if the payload is valid
+    """
+    if not isinstance(data, dict) or "name" not in data:
+        return None, "Missing required field: name"
+
+    name = data["name"]
+    error = _check_name(name)
+
+    if error:
+        return None, error
+
+    return name, None
+
+
+def _parse_product_update(data, partial=False):
+    """
+    Validate the payload of a product update
+    A missing strikeout means False, unless partial is set: then only the
+    fields present change, as batch items only carry what changed
+    Returns a (name, strikeout, error) tuple, error is None if the payload is valid
+    """
+    if not isinstance(data, dict) or ("name" not in data and "strikeout" not in data):
+        return None, None, "No fields to update provided"
+
+    name = data.get("name")
+    strikeout = data.get("strikeout") if partial else data.get("strikeout", False)
+
+    if name is not None:
+        error = _check_name(name)
+        if error:
+            return None, None, error
+
+    if strikeout is not None and not isinstance(strikeout, bool):
+        return None, None, "Field strikeout must be true or false"
+
+    return name, strikeout, None
+
+
+def _parse_product_move(data, product_id):
+    """
+    Validate the payload of a product move
+    Returns an (after_id, error) tuple, error is None if the payload is valid
+    """
+    if not isinstance(data, dict) or "after" not in data:
+        return None, "Missing required field: after"
+
+    after_id = data["after"]
+
+    if after_id is not None and not isinstance(after_id, str):
+        return None, "Field after must be a product ID or null"
+
+    if after_id == product_id:
+        return None, "A product cannot be moved after itself"
+
+    return after_id, None
 
 
 @api.route("/api/shoplists/<shop_list_id>/products", methods=["POST"])
@@ -13,22 +93,17 @@ def add_product(shop_list_id):
     Add a product to a shop list
     Requires the user to have Write access to the shop list
     """
-    user_id = session.get("user_id")
+    user_id = g.current_user["id"]
 
     access = ShopListService.check_user_access(shop_list_id, user_id, Access.Write)
 
     if not access:
         return jsonify({"error": "Shop list not found or access denied"}), 404
 
-    data = request.get_json()
-
-    if not data or "name" not in data:
-        return jsonify({"error": "Missing required field: name"}), 400
+    name, error = _parse_new_product(request.get_json())
 
-    name = data["name"]
-
-    if not name or not name.strip():
-        return jsonify({"error": "Product name cannot be empty"}), 400
+    if error:
+        return jsonify({"error": error}), 400
 
     product = ProductService.add_product(shop_list_id, name)
 
@@ -40,21 +115,153 @@ def add_product(shop_list_id):
 
 @api.route("/api/shoplists/<shop_list_id>/products", methods=["GET"])
 @login_required
+@read_only
 def get_products(shop_list_id):
     """
     Get all products in a shop list
     Requires the user to have at least Read access to the shop list
+    Pass limit and/or cursor for keyset pagination
+    Supports conditional requests through If-None-Match
     """
-    user_id = session.get("user_id")
+    user_id = g.current_user["id"]
 
     access = ShopListService.check_user_access(shop_list_id, user_id)
 
     if not access:
         return jsonify({"error": "Shop list not found or access denied"}), 404
 
-    products = ProductService.get_products_for_shop_list(shop_list_id)
+    shop_list = ShopListService.get_shop_list_by_id(shop_list_id)
+    etag = f"{shop_list.id}-{shop_list.version}-products"
+
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    if is_paged_request():
+        limit, cursor, error = get_page_args(key_type=str)
+
+        if error:
+            return jsonify({"error": error}), 400
+
+        products, next_cursor = ProductService.get_products_page(
+            shop_list_id, limit, cursor
+        )
+        data = {
+            "items": [product.to_dict() for product in products],
+            "nextCursor": next_cursor,
+        }
 
-    return jsonify([product.to_dict() for product in products]), 200
+        return with_etag(jsonify(data), etag), 200
+
+    products = ProductService.get_product_documents_for_shop_list(shop_list_id)
+
+    return with_etag(jsonify(products), etag), 200
+
+
+@api.route("/api/shoplists/<shop_list_id>/products/batch", methods=["POST"])
+@login_required
+def batch_products(shop_list_id):
+    """
+    Create, update and delete many products of a shop list in one transaction
+    Requires the user to have Write access to the shop list
+    Body: {"create": [{"name"}], "update": [{"id", "name", "strikeout"}], "delete": [id]}
+    An update item only changes the fields it carries
+    Every item gets its own result, invalid items are reported and skipped
+    """
+    user_id = g.current_user["id"]
+
+    access = ShopListService.check_user_access(shop_list_id, user_id, Access.Write)
+
+    if not access:
+        return jsonify({"error": "Shop list not found or access denied"}), 404
+
+    data = request.get_json()
+
+    if not isinstance(data, dict) or not any(
+        key in data for key in ("create", "update", "delete")
+    ):
+        return jsonify(
+            {"error": "Missing required fields: create, update or delete"}
+        ), 400
+
+    creates = data.get("create", [])
+    updates = data.get("update", [])
+    deletes = data.get("delete", [])
+
+    if not all(isinstance(items, list) for items in (creates, updates, deletes)):
+        return jsonify(
+            {"error": "Fields create, update and delete must be arrays"}
+        ), 400
+
+    if len(creates) + len(updates) + len(deletes) > MAX_BATCH_SIZE:
+        return jsonify(
+            {"error": f"A batch can contain at most {MAX_BATCH_SIZE} items"}
+        ), 400
+
+    results = {"create": [], "update": [], "delete": []}
+    valid_creates = []
+    valid_updates = []
+    valid_deletes = []
+
+    for item in creates:
+        name, error = _parse_new_product(item)
+        if error:
+            results["create"].append({"status": 400, "error": error})
+        else:
+            results["create"].append(None)
+            valid_creates.append(name)
+
+    for item in updates:
+        name, strikeout, error = _parse_product_update(item, partial=True)
+        if not error and not isinstance(item.get("id"), str):
+            error = "Missing required field: id"
+        if error:
+            results["update"].append({"status": 400, "error": error})
+        else:
+            results["update"].append(None)
+            valid_updates.append((item["id"], name, strikeout))
+
+    for product_id in deletes:
+        if not isinstance(product_id, str):
+            results["delete"].append(
+                {"status": 400, "error": "Product IDs must be strings"}
+            )
+        else:
+            results["delete"].append(None)
+            valid_deletes.append(product_id)
+
+    applied = ProductService.apply_batch(
+        shop_list_id, valid_creates, valid_updates, valid_deletes
+    )
+
+    if applied is None:
+        return jsonify({"error": "Failed to apply batch"}), 500
+
+    created, updated, deleted = applied
+
+    for kind, outcomes in (("create", created), ("update", updated)):
+        outcomes = iter(outcomes)
+        for index, result in enumerate(results[kind]):
+            if result is not None:
+                continue
+            product = next(outcomes)
+            if product is None:
+                results[kind][index] = {"status": 404, "error": "Product not found"}
+            else:
+                results[kind][index] = {
+                    "status": 201 if kind == "create" else 200,
+                    "product": product.to_dict(),
+                }
+
+    deleted = iter(deleted)
+    for index, result in enumerate(results["delete"]):
+        if result is not None:
+            continue
+        if next(deleted):
+            results["delete"][index] = {"status": 204}
+        else:
+            results["delete"][index] = {"status": 404, "error": "Product not found"}
+
+    return jsonify(results), 200
 
 
 @api.route("/api/shoplists/<shop_list_id>/products<product_id>", methods=["PUT"])
@@ -64,37 +271,72 @@ def update_product(shop_list_id, product_id):
     Update a product
     Requires the user to have Write access to the parent shop list
     """
-    user_id = session.get("user_id")
+    user_id = g.current_user["id"]
 
-    product = ProductService.get_product_by_id(product_id)
+    name, strikeout, error = _parse_product_update(request.get_json())
 
-    if not product:
-        return jsonify({"error": "Product not found"}), 404
+    if error:
+        return jsonify({"error": error}), 400
 
-    access = ShopListService.check_user_access(
-        product.shop_list_id, user_id, Access.Write
+    updated_product = ProductService.update_product(
+        product_id, name, strikeout, user_id=user_id
     )
 
-    if not access:
-        return jsonify({"error": "Access denied to parent shop list"}), 403
+    if not updated_product:
+        product = ProductService.get_product_by_id(product_id)
 
-    data = request.get_json()
+        if not product:
+            return jsonify({"error": "Product not found"}), 404
 
-    if not data or ("name" not in data and "strikeout" not in data):
-        return jsonify({"error": "No fields to update provided"}), 400
+        if not ShopListService.check_user_access(
+            product.shop_list_id, user_id, Access.Write
+        ):
+            return jsonify({"error": "Access denied to parent shop list"}), 403
 
-    name = data.get("name")
-    strikeout = data.get("strikeout", False)
+        return jsonify({"error": "Failed to update product"}), 500
 
-    if name is not None and (not name or not name.strip()):
-        return jsonify({"error": "Product name cannot be empty"}), 400
+    return jsonify(updated_product.to_dict()), 200
 
-    updated_product = ProductService.update_product(product_id, name, strikeout)
 
-    if not updated_product:
-        return jsonify({"error": "Failed to update product"}), 500
+@api.route("/api/shoplists/<shop_list_id>/products/<product_id>/move", methods=["POST"])
+@login_required
+def move_product(shop_list_id, product_id):
+    """
+    Move a product right after another product, or to the start of the list
+    Requires the user to have Write access to the shop list
+    Body: {"after": product ID or null}
+    Only the moved product changes, collaborators get a product.moved event
+    """
+    user_id = g.current_user["id"]
 
-    return jsonify(updated_product.to_dict()), 200
+    after_id, error = _parse_product_move(request.get_json(), product_id)
+
+    if error:
+        return jsonify({"error": error}), 400
+
+    product = ProductService.move_product(
+        shop_list_id, product_id, after_id, user_id=user_id
+    )
+
+    if not product:
+        if not ShopListService.check_user_access(shop_list_id, user_id, Access.Write):
+            return jsonify({"error": "Shop list not found or access denied"}), 404
+
+        moved = ProductService.get_product_by_id(product_id)
+
+        if not moved or moved.shop_list_id != shop_list_id:
+            return jsonify({"error": "Product not found"}), 404
+
+        after = ProductService.get_product_by_id(after_id) if after_id else None
+
+        if after_id and (not after or after.shop_list_id != shop_list_id):
+            return jsonify(
+                {"error": "Field after must be a product of this shop list"}
+            ), 400
+
+        return jsonify({"error": "Failed to move product"}), 500
+
+    return jsonify(product.to_dict()), 200
 
 
 @api.route("/api/shoplists/<shop_list_id>/products/<product_id>", methods=["DELETE"])
@@ -104,23 +346,21 @@ def delete_product(shop_list_id, product_id):
     Delete a product
     Requires the user to have Write access to the parent shop list
     """
-    user_id = session.get("user_id")
+    user_id = g.current_user["id"]
 
-    product = ProductService.get_product_by_id(product_id)
+    success = ProductService.delete_product(product_id, user_id=user_id)
 
-    if not product:
-        return jsonify({"error": "Product not found"}), 404
+    if not success:
+        product = ProductService.get_product_by_id(product_id)
 
-    access = ShopListService.check_user_access(
-        product.shop_list_id, user_id, Access.Write
-    )
+        if not product:
+            return jsonify({"error": "Product not found"}), 404
 
-    if not access:
-        return jsonify({"error": "Access denied to parent shop list"}), 404
+        if not ShopListService.check_user_access(
+            product.shop_list_id, user_id, Access.Write
+        ):
+            return jsonify({"error": "Access denied to parent shop list"}), 404
 
-    success = ProductService.delete_product(product_id)
-
-    if not success:
         return jsonify({"error": "Failed to delete product"}), 500
 
     return "", 204
@@ -0,0 +1,18 @@
+from functools import wraps
+from models import db
+from services.replicas import replica_router
+
+
+def read_only(f):
+    """
+    Serve the reads of a route from a read replica when one is configured
+    Users who wrote recently keep reading from the primary
+    """
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not replica_router.reads_from_primary():
+            db.session.info["read_only"] = True
+        return f(*args, **kwargs)
+
+    return decorated_function
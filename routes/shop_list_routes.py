@@ -1,8 +1,32 @@
-from flask import request, jsonify, session
+import json
+from functools import partial
+from flask import (
+    Response,
+    current_app,
+    g,
+    jsonify,
+    request,
+    stream_with_context,
+    url_for,
+)
 from routes import api
+from models import db
+from services.events import EventStreamsBusy, event_bus
+from services.document_cache import document_cache
 from services.shop_list_service import ShopListService
+from services.product_service import ProductService
+from services.product_io import (
+    FORMATS,
+    ImportFormatError,
+    format_for,
+    read_products,
+    write_products,
+)
 from models.shop_list import Access
 from routes.login_required import login_required
+from routes.read_only import read_only
+from routes.conditional import is_not_modified, not_modified, with_etag
+from routes.pagination import get_page_args, is_paged_request
 
 
 @api.route("/api/shoplists", methods=["POST"])
@@ -11,7 +35,7 @@ def create_shop_list():
     """
     Create a new shopping list
     """
-    user_id = session.get("user_id")
+    user_id = g.current_user["id"]
 
     data = request.get_json()
 
@@ -28,26 +52,162 @@ def create_shop_list():
     return jsonify(shop_list.to_dict()), 201
 
 
+@api.route("/api/shoplists/import", methods=["POST"])
+@login_required
+def import_shop_list():
+    """
+    Create a shop list from an NDJSON or CSV upload of products
+    The body is read and written row by row, so any size can be imported
+    The list name is taken from ?name=, the format from ?format=ndjson|csv
+    or the Content-Type (application/x-ndjson or text/csv)
+    """
+    user_id = g.current_user["id"]
+
+    name = request.args.get("name", "")
+
+    if not name.strip():
+        return jsonify({"error": "Missing required parameter: name"}), 400
+
+    data_format = format_for(request.mimetype, request.args.get("format"))
+
+    if data_format is None:
+        return jsonify({"error": "Unsupported format, use ndjson or csv"}), 415
+
+    products = read_products(request.stream, data_format, current_app.json.loads)
+
+    try:
+        shop_list, count = ProductService.import_shop_list(
+            name, user_id, products, current_app.config["IMPORT_CHUNK_SIZE"]
+        )
+    except ImportFormatError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not shop_list:
+        return jsonify({"error": "Failed to import shop list"}), 500
+
+    return jsonify(
+        {**shop_list.to_dict(include_products=False), "imported": count}
+    ), 201
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _stream_shop_list_documents(user_id):
+    """
+    Write the shop lists of a user as a JSON array, a chunk at a time
+    The output matches jsonify's compact, key-sorted form byte for byte
+    """
+    dumps = partial(current_app.json.dumps, separators=(",", ":"))
+    buffer = ["["]
+    size = 1
+    shares = None
+    first_product = True
+
+    for kind, *payload in ShopListService.iter_shop_list_documents_for_user(user_id):
+        if kind == "list":
+            header, next_shares = payload
+            if shares is not None:
+                buffer.append(f'],"sharedWith":{dumps(shares)}}},')
+            # Sorted keys put "products" and "sharedWith" after the header keys
+            buffer.append(dumps(header)[:-1] + ',"products":[')
+            shares = next_shares
+            first_product = True
+        else:
+            buffer.append(
+                dumps(payload[0]) if first_product else "," + dumps(payload[0])
+            )
+            first_product = False
+
+        size += len(buffer[-1])
+        if size >= STREAM_CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+
+    if shares is not None:
+        buffer.append(f'],"sharedWith":{dumps(shares)}}}')
+    buffer.append("]\n")
+    yield "".join(buffer)
+
+
 @api.route("/api/shoplists", methods=["GET"])
 @login_required
+@read_only
 def get_shop_lists():
     """
     Get all shop lists for the current user
+    Pass limit and/or cursor for keyset pagination, and products=false to
+    leave out the embedded products
+    Pass stream=true to stream the full export with constant memory
+    Unpaginated requests support conditional requests through If-None-Match
     """
-    user_id = session.get("user_id")
+    user_id = g.current_user["id"]
+
+    if request.args.get("stream", "false").lower() in ("true", "1"):
+        return Response(
+            stream_with_context(_stream_shop_list_documents(user_id)),
+            mimetype="application/json",
+        )
 
-    shop_lists = ShopListService.get_shop_lists_for_user(user_id)
+    include_products = request.args.get("products", "true").lower() not in (
+        "false",
+        "0",
+    )
 
-    return jsonify([shop_list.to_dict() for shop_list in shop_lists]), 200
+    if is_paged_request():
+        limit, cursor, error = get_page_args()
+
+        if error:
+            return jsonify({"error": error}), 400
+
+        shop_lists, next_cursor = ShopListService.get_shop_list_documents_page(
+            user_id, limit, cursor, include_products
+        )
+
+        return jsonify({"items": shop_lists, "nextCursor": next_cursor}), 200
+
+    etag = ShopListService.get_collection_version(user_id)
+
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    shop_lists = ShopListService.get_shop_list_documents_for_user(
+        user_id, include_products
+    )
+
+    return with_etag(jsonify(shop_lists), etag), 200
+
+
+@api.route("/api/shoplists/summary", methods=["GET"])
+@login_required
+@read_only
+def get_shop_list_summaries():
+    """
+    Get the name, product count and open (not struck out) product count of
+    every shop list the current user has access to, without their products
+    Supports conditional requests through If-None-Match
+    """
+    user_id = g.current_user["id"]
+
+    summaries, etag = ShopListService.get_shop_list_summaries(user_id)
+
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    return with_etag(jsonify(summaries), etag), 200
 
 
 @api.route("/api/shoplists/<shop_list_id>", methods=["GET"])
 @login_required
+@read_only
 def get_shop_list(shop_list_id):
     """
     Get a specific shop list
+    Supports conditional requests through If-None-Match
+    The serialized document is cached until the list changes
     """
-    user_id = session.get("user_id")
+    user_id = g.current_user["id"]
 
     access = ShopListService.check_user_access(shop_list_id, user_id)
 
@@ -55,8 +215,153 @@ def get_shop_list(shop_list_id):
         return jsonify({"error": "Shop list not found or access denied"}), 404
 
     shop_list = ShopListService.get_shop_list_by_id(shop_list_id)
+    etag = f"{shop_list.id}-{shop_list.version}"
+
+    if is_not_modified(etag):
+        return not_modified(etag)
 
-    return jsonify(shop_list.to_dict()), 200
+    body = document_cache.get(shop_list.id, shop_list.version)
+
+    if body is None:
+        response = jsonify(ShopListService.get_shop_list_document(shop_list))
+        document_cache.set(shop_list.id, shop_list.version, response.get_data())
+    else:
+        response = current_app.response_class(body, mimetype="application/json")
+
+    return with_etag(response, etag), 200
+
+
+@api.route("/api/shoplists/<shop_list_id>/export", methods=["GET"])
+@login_required
+@read_only
+def export_shop_list(shop_list_id):
+    """
+    Stream the products of a shop list as NDJSON (default) or CSV
+    Pass ?format=csv for CSV, the output can be imported again as is
+    """
+    user_id = g.current_user["id"]
+
+    access = ShopListService.check_user_access(shop_list_id, user_id)
+
+    if not access:
+        return jsonify({"error": "Shop list not found or access denied"}), 404
+
+    data_format = request.args.get("format", "ndjson")
+
+    if data_format not in FORMATS:
+        return jsonify({"error": "Unsupported format, use ndjson or csv"}), 400
+
+    chunks = write_products(
+        ProductService.iter_product_documents(shop_list_id),
+        data_format,
+        partial(current_app.json.dumps, separators=(",", ":")),
+        STREAM_CHUNK_SIZE,
+    )
+    filename = f"shoplist-{shop_list_id}.{data_format}"
+
+    return Response(
+        stream_with_context(chunks),
+        mimetype=FORMATS[data_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@api.route("/api/shoplists/<shop_list_id>/changes", methods=["GET"])
+@login_required
+def get_shop_list_changes(shop_list_id):
+    """
+    Get products and shares changed since a cursor, plus deleted ones
+    Without ?since= the full current state and a fresh cursor are returned
+    """
+    user_id = g.current_user["id"]
+
+    access = ShopListService.check_user_access(shop_list_id, user_id)
+
+    if not access:
+        return jsonify({"error": "Shop list not found or access denied"}), 404
+
+    since = request.args.get("since")
+
+    try:
+        since = int(since) if since is not None else None
+        if since is not None and since < 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    shop_list = ShopListService.get_shop_list_by_id(shop_list_id)
+    changes = ShopListService.get_changes(shop_list, since)
+
+    if changes is None:
+        return jsonify({"error": "Cursor expired, reload the full shop list"}), 410
+
+    return jsonify(changes), 200
+
+
+@api.route("/api/shoplists/<shop_list_id>/events", methods=["GET"])
+@login_required
+def stream_shop_list_events(shop_list_id):
+    """
+    Stream changes to a shop list as Server-Sent Events
+    The database session is released before streaming, and a client that
+    falls too far behind gets a resync event and should reload via /changes
+    Streams are meant for the evented process (see gunicorn.conf.py), where
+    waiting for events only holds a greenlet. A threaded worker serves at
+    most WORKER_THREADS - 1 of them and answers 503 beyond that; clients
+    should then poll /changes
+    """
+    user_id = g.current_user["id"]
+
+    access = ShopListService.check_user_access(shop_list_id, user_id)
+
+    if not access:
+        return jsonify({"error": "Shop list not found or access denied"}), 404
+
+    try:
+        subscription = event_bus.subscribe(shop_list_id)
+    except EventStreamsBusy as e:
+        response = jsonify({"error": "Too many open event streams"})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response
+
+    app = current_app._get_current_object()
+    heartbeat_interval = event_bus.heartbeat_interval
+    db.session.close()
+
+    def lost_access():
+        with app.app_context():
+            return not ShopListService.check_user_access(shop_list_id, user_id)
+
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = subscription.get(timeout=heartbeat_interval)
+
+                if subscription.overflowed:
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+
+                if event is None:
+                    yield ": heartbeat\n\n"
+                    continue
+
+                data = json.dumps(event, separators=(",", ":"))
+                yield f"id: {event['version']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+                if event["type"] == "list.deleted" or (
+                    event["type"] == "shares.removed" and lost_access()
+                ):
+                    return
+        finally:
+            subscription.close()
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @api.route("/api/shoplists/<shop_list_id>/share", methods=["POST"])
@@ -65,7 +370,7 @@ def share_shop_list(shop_list_id):
     """
     Share a shop list with multiple users
     """
-    user_id = session.get("user_id")
+    user_id = g.current_user["id"]
 
     shop_list = ShopListService.get_shop_list_by_id(shop_list_id)
 
@@ -96,6 +401,21 @@ def share_shop_list(shop_list_id):
             }
         ), 400
 
+    # Large groups are shared by the job worker, the client polls the job
+    threshold = current_app.config.get("SHARE_JOB_THRESHOLD", 0)
+    if threshold and len(usernames) > threshold:
+        job = ShopListService.share_shop_list_later(
+            shop_list_id, usernames, access, user_id
+        )
+        if job is None:
+            return jsonify({"error": "Failed to share shop list"}), 500
+
+        return (
+            jsonify(job.to_dict()),
+            202,
+            {"Location": url_for("api.get_job", job_id=job.id)},
+        )
+
     shared_user_ids = ShopListService.share_shop_list(shop_list_id, usernames, access)
 
     if shared_user_ids is None:
@@ -110,7 +430,7 @@ def unshare_shop_list(shop_list_id):
     """
     Unshare a shop list from multiple users
     """
-    user_id = session.get("user_id")
+    user_id = g.current_user["id"]
 
     shop_list = ShopListService.get_shop_list_by_id(shop_list_id)
 
@@ -147,7 +467,7 @@ def delete_shop_list(shop_list_id):
     Delete a shop list
     Only the owner can delete their shop list
     """
-    user_id = session.get("user_id")
+    user_id = g.current_user["id"]
 
     shop_list = ShopListService.get_shop_list_by_id(shop_list_id)
 
@@ -172,7 +492,7 @@ def update_shop_list(shop_list_id):
     Update a shop list's name
     Only the owner or users with Write access can update the list
     """
-    user_id = session.get("user_id")
+    user_id = g.current_user["id"]
 
     shop_list = ShopListService.get_shop_list_by_id(shop_list_id)
 
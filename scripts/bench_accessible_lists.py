@@ -0,0 +1,165 @@
+"""
+Benchmark the "shop lists accessible to a user" lookup
+
+Seeds a database with many shop lists spread over many users, then compares
+the old three round trip lookup (owned lists, shared IDs, IN over shared IDs)
+with ShopListService.get_shop_lists_for_user and prints p50/p99 latencies.
+The old lookup is measured first without the lookup indexes, as before they
+were added, then with them, so the gain of each part shows separately.
+
+Run against a scratch database, the seeded tables are dropped first. The
+script refuses unless the database name contains scratch or bench, or --yes
+is passed:
+    DATABASE_URL=postgresql://... python scripts/bench_accessible_lists.py
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app import create_app
+from models import db
+from models.shop_list import ShopList, ShopListShare
+from models.user import User
+from services.shop_list_service import ShopListService
+from scratch_database import require_scratch_database
+
+LOOKUP_INDEXES = (
+    "ix_shop_lists_owner_id",
+    "ix_shop_list_shares_user_id_shop_list_id",
+)
+
+
+def seed(num_lists, num_users, shares_per_list):
+    db.drop_all()
+    db.create_all()
+
+    now = datetime.utcnow()
+    user_ids = [str(uuid.uuid4()) for _ in range(num_users)]
+    db.session.execute(
+        User.__table__.insert(),
+        [
+            {"id": user_id, "username": f"user{i}", "password_hash": "x"}
+            for i, user_id in enumerate(user_ids)
+        ],
+    )
+
+    for start in range(0, num_lists, 10000):
+        lists = []
+        shares = []
+        for i in range(start, min(start + 10000, num_lists)):
+            list_id = str(uuid.uuid4())
+            owner_id = random.choice(user_ids)
+            lists.append(
+                {
+                    "id": list_id,
+                    "name": f"list{i}",
+                    "owner_id": owner_id,
+                    "created_at": now - timedelta(seconds=i),
+                }
+            )
+            for user_id in random.sample(user_ids, shares_per_list):
+                if user_id != owner_id:
+                    shares.append(
+                        {
+                            "id": str(uuid.uuid4()),
+                            "shop_list_id": list_id,
+                            "user_id": user_id,
+                            "access": 1,
+                        }
+                    )
+        db.session.execute(ShopList.__table__.insert(), lists)
+        if shares:
+            db.session.execute(ShopListShare.__table__.insert(), shares)
+        db.session.commit()
+
+    return user_ids
+
+
+def lookup_indexes():
+    """
+    Get the indexes the single query lookup was added with
+    """
+    return [
+        index
+        for table in (ShopList.__table__, ShopListShare.__table__)
+        for index in table.indexes
+        if index.name in LOOKUP_INDEXES
+    ]
+
+
+def set_lookup_indexes(present):
+    connection = db.session.connection()
+    for index in lookup_indexes():
+        if present:
+            index.create(connection, checkfirst=True)
+        else:
+            index.drop(connection, checkfirst=True)
+    if connection.dialect.name == "postgresql":
+        db.session.execute(text("ANALYZE"))
+    db.session.commit()
+
+
+def legacy_lookup(user_id):
+    owned_lists = ShopList.query.filter_by(owner_id=user_id).all()
+    shared_lists_ids = (
+        db.session.query(ShopListShare.shop_list_id).filter_by(user_id=user_id).all()
+    )
+    shared_lists_ids = [id[0] for id in shared_lists_ids]
+    shared_lists = ShopList.query.filter(ShopList.id.in_(shared_lists_ids)).all()
+    return owned_lists + shared_lists
+
+
+def measure(lookup, user_ids, iterations):
+    timings = []
+    for _ in range(iterations):
+        user_id = random.choice(user_ids)
+        start = time.perf_counter()
+        lookup(user_id)
+        timings.append((time.perf_counter() - start) * 1000)
+        db.session.expunge_all()
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lists", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--shares-per-list", type=int, default=2)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument(
+        "--yes",
+        action="store_true",
+        help="Drop the tables even if DATABASE_URL is not a scratch database",
+    )
+    args = parser.parse_args()
+
+    random.seed(42)
+    app = create_app()
+    require_scratch_database(app.config["SQLALCHEMY_DATABASE_URI"], args.yes)
+    with app.app_context():
+        print(f"Seeding {args.lists} shop lists for {args.users} users...")
+        user_ids = seed(args.lists, args.users, args.shares_per_list)
+
+        for label, indexes, lookup in (
+            ("before (3 round trips)", False, legacy_lookup),
+            ("3 round trips + indexes", True, legacy_lookup),
+            ("after (single UNION)", True, ShopListService.get_shop_lists_for_user),
+        ):
+            set_lookup_indexes(indexes)
+            p50, p99 = measure(lookup, user_ids, args.iterations)
+            print(f"{label:<24} p50={p50:.2f}ms p99={p99:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
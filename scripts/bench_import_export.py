@@ -0,0 +1,140 @@
+"""
+Benchmark bulk import and export of shop list products
+
+Generates an NDJSON and a CSV file of products in memory and measures:
+- importing them with per-item ProductService.add_product calls;
+- importing them through ProductService.import_shop_list, with chunked
+  inserts, or COPY on PostgreSQL with psycopg 3;
+- streaming them back out with the export writer.
+Prints rows per second, and with --memory the peak Python memory of each
+run, which stays flat as --products grows. The per-item baseline only
+imports --baseline-products rows, as it is much slower.
+
+Run against a scratch database, the tables are dropped first. The script
+refuses unless the database name contains scratch or bench, or --yes is
+passed:
+    DATABASE_URL=postgresql+psycopg://... python scripts/bench_import_export.py
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db
+from models.shop_list import ShopList
+from models.user import User
+from services.product_io import read_products, write_products
+from services.product_service import ProductService
+from scratch_database import require_scratch_database
+
+
+def seed():
+    db.drop_all()
+    db.create_all()
+
+    owner_id = str(uuid.uuid4())
+    db.session.execute(
+        User.__table__.insert(),
+        [{"id": owner_id, "username": "owner", "password_hash": "x"}],
+    )
+    db.session.commit()
+    return owner_id
+
+
+def build_file(data_format, num_products):
+    if data_format == "csv":
+        lines = ["name,strikeout\n"]
+        lines += [
+            f"product {i},{'true' if i % 3 == 0 else 'false'}\n"
+            for i in range(num_products)
+        ]
+    else:
+        lines = [
+            f'{{"name":"product {i}","strikeout":{"true" if i % 3 == 0 else "false"}}}\n'
+            for i in range(num_products)
+        ]
+    return "".join(lines).encode()
+
+
+def measure(label, rows, run, trace_memory):
+    db.session.expunge_all()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+
+    line = f"{label:<24} {elapsed * 1000:8.0f}ms {rows / elapsed:12,.0f} rows/s"
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        line += f" peak={peak / 2**20:.1f} MiB"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--baseline-products", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="Also report peak Python memory (tracing slows every run down)",
+    )
+    parser.add_argument(
+        "--yes",
+        action="store_true",
+        help="Drop the tables even if DATABASE_URL is not a scratch database",
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    require_scratch_database(app.config["SQLALCHEMY_DATABASE_URI"], args.yes)
+    with app.app_context():
+        owner_id = seed()
+        print(f"{args.products} products, {db.engine.dialect.name}")
+
+        def per_item():
+            shop_list = ShopList(name="Baseline", owner_id=owner_id)
+            db.session.add(shop_list)
+            db.session.commit()
+            for i in range(args.baseline_products):
+                ProductService.add_product(shop_list.id, f"product {i}")
+
+        measure("add_product per item", args.baseline_products, per_item, args.memory)
+
+        shop_list_id = None
+        for data_format in ("ndjson", "csv"):
+            body = build_file(data_format, args.products)
+
+            def bulk():
+                nonlocal shop_list_id
+                products = read_products(io.BytesIO(body), data_format)
+                shop_list, count = ProductService.import_shop_list(
+                    "Imported", owner_id, products, args.chunk_size
+                )
+                assert count == args.products, count
+                shop_list_id = shop_list.id
+
+            measure(f"import {data_format}", args.products, bulk, args.memory)
+
+        for data_format in ("ndjson", "csv"):
+
+            def export():
+                products = ProductService.iter_product_documents(shop_list_id)
+                for _ in write_products(products, data_format, app.json.dumps):
+                    pass
+
+            measure(f"export {data_format}", args.products, export, args.memory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark serialization of a large shop list
+
+Seeds one shop list with many products, then compares building the
+GET /api/shoplists/<id> body the old way (ORM objects, to_dict, stdlib json)
+with the new way (Core column tuples mapped to dicts, orjson when installed)
+and prints throughput for each stage combination.
+
+Run against a scratch database, the seeded tables are dropped first. The
+script refuses unless the database name contains scratch or bench, or --yes
+is passed:
+    DATABASE_URL=postgresql://... python scripts/bench_serialization.py
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import create_app
+from json_provider import OrjsonProvider, orjson
+from models import db
+from models.shop_list import Product, ShopList, ShopListShare
+from models.user import User
+from services.ranks import spread_ranks
+from services.shop_list_service import ShopListService
+from scratch_database import require_scratch_database
+
+
+def seed(num_products, num_shares):
+    db.drop_all()
+    db.create_all()
+
+    now = datetime.utcnow()
+    owner_id = str(uuid.uuid4())
+    shop_list_id = str(uuid.uuid4())
+    users = [{"id": owner_id, "username": "owner", "password_hash": "x"}]
+    users += [
+        {"id": str(uuid.uuid4()), "username": f"user{i}", "password_hash": "x"}
+        for i in range(num_shares)
+    ]
+    db.session.execute(User.__table__.insert(), users)
+    db.session.execute(
+        ShopList.__table__.insert(),
+        [{"id": shop_list_id, "name": "Benchmark", "owner_id": owner_id}],
+    )
+    db.session.execute(
+        ShopListShare.__table__.insert(),
+        [
+            {
+                "id": str(uuid.uuid4()),
+                "shop_list_id": shop_list_id,
+                "user_id": user["id"],
+                "access": 1,
+            }
+            for user in users[1:]
+        ],
+    )
+    db.session.execute(
+        Product.__table__.insert(),
+        [
+            {
+                "id": str(uuid.uuid4()),
+                "name": f"product {i}",
+                "strikeout": i % 3 == 0,
+                "shop_list_id": shop_list_id,
+                "rank": rank,
+                "created_at": now + timedelta(microseconds=i),
+            }
+            for i, rank in enumerate(spread_ranks(num_products))
+        ],
+    )
+    db.session.commit()
+    return shop_list_id
+
+
+def orm_document(shop_list_id):
+    return db.session.get(ShopList, shop_list_id).to_dict()
+
+
+def core_document(shop_list_id):
+    shop_list = db.session.get(ShopList, shop_list_id)
+    return ShopListService.get_shop_list_document(shop_list)
+
+
+def measure(build, provider, shop_list_id, iterations):
+    timings = []
+    size = 0
+    for _ in range(iterations):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        body = provider.dumps(build(shop_list_id), separators=(",", ":"))
+        timings.append(time.perf_counter() - start)
+        size = len(body)
+    return statistics.median(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--shares", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument(
+        "--yes",
+        action="store_true",
+        help="Drop the tables even if DATABASE_URL is not a scratch database",
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    require_scratch_database(app.config["SQLALCHEMY_DATABASE_URI"], args.yes)
+    with app.app_context():
+        print(f"Seeding a shop list with {args.products} products...")
+        shop_list_id = seed(args.products, args.shares)
+
+        providers = [("stdlib", DefaultJSONProvider(app))]
+        if orjson is not None:
+            providers.append(("orjson", OrjsonProvider(app)))
+        else:
+            print("orjson is not installed, only the stdlib provider is measured")
+
+        for read_label, build in (("ORM", orm_document), ("Core", core_document)):
+            for json_label, provider in providers:
+                p50, size = measure(build, provider, shop_list_id, args.iterations)
+                label = f"{read_label} + {json_label}"
+                print(
+                    f"{label:<16} p50={p50 * 1000:.2f}ms "
+                    f"{args.products / p50:,.0f} products/s "
+                    f"{size / p50 / 2**20:.1f} MiB/s"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Measure cold-start time to the first served request
+
+Starts the server command, polls a URL until any HTTP response comes back and
+prints the time from spawn to that response, repeated a few times. The
+default command is gunicorn with gunicorn.conf.py; the database must already
+be migrated (`flask db upgrade`):
+    DATABASE_URL=postgresql://... python scripts/measure_cold_start.py
+    python scripts/measure_cold_start.py --command "flask run --port 5055" \\
+        --url http://127.0.0.1:5055/api/auth/me
+"""
+
+import argparse
+import os
+import shlex
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_for_response(url, process, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            # Any status means the app served the request
+            return e.code
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            time.sleep(0.01)
+    raise RuntimeError(f"No response from {url} within {timeout}s")
+
+
+def measure(command, url, timeout):
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command,
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    try:
+        status = wait_for_response(url, process, timeout)
+        return time.perf_counter() - start, status
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--command",
+        default=f"{sys.executable} -m gunicorn --bind 127.0.0.1:5055 app:create_app()",
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:5055/api/auth/me")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    command = shlex.split(args.command)
+    timings = []
+    for run in range(args.runs):
+        elapsed, status = measure(command, args.url, args.timeout)
+        timings.append(elapsed)
+        print(f"run {run + 1}: {elapsed * 1000:.0f}ms (HTTP {status})")
+
+    print(
+        f"median={statistics.median(timings) * 1000:.0f}ms "
+        f"min={min(timings) * 1000:.0f}ms max={max(timings) * 1000:.0f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
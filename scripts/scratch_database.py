@@ -0,0 +1,35 @@
+"""
+Guard for the benchmark scripts, which drop and recreate every table
+"""
+
+import sys
+
+from sqlalchemy.engine import make_url
+
+# A database whose name contains one of these is taken to be disposable
+SCRATCH_NAMES = ("scratch", "bench")
+
+
+def is_scratch_database(url):
+    """
+    Check whether a database URL names a disposable database, in-memory
+    SQLite included
+    """
+    database = make_url(url).database or ""
+    if database in ("", ":memory:"):
+        return make_url(url).get_backend_name() == "sqlite"
+    return any(name in database.lower() for name in SCRATCH_NAMES)
+
+
+def require_scratch_database(url, confirmed=False):
+    """
+    Exit unless the database is a scratch database or the user passed --yes
+    """
+    if confirmed or is_scratch_database(url):
+        return
+
+    safe_url = make_url(url).render_as_string(hide_password=True)
+    sys.exit(
+        f"Refusing to drop every table of {safe_url}. Point DATABASE_URL at a "
+        f"database whose name contains {' or '.join(SCRATCH_NAMES)}, or pass --yes"
+    )
@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheBackend:
+    """
+    Storage behind an application cache
+    Shared backends (Redis, memcached, ...) subclass this and are selected by
+    import path in the config. Keys are strings and values are bytes, so a
+    shared backend can store them as they are. evictions counts the entries
+    dropped to make room, for backends that can tell
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Get the value stored under key, returns None if missing or expired
+        """
+        raise NotImplementedError
+
+    def set(self, key, value):
+        """
+        Store value under key for ttl seconds
+        """
+        raise NotImplementedError
+
+    def delete(self, keys):
+        """
+        Remove the given keys, missing keys are ignored
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend):
+    """
+    In-process cache holding at most max_entries values for ttl seconds each
+    The least recently used entry is evicted once the cache is full
+    Values are kept as they are, so any Python object can be stored
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        super().__init__(max_entries, ttl)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
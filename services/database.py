@@ -0,0 +1,127 @@
+import sqlite3
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+# Errors that mean the server behind a pooled connection is going away or is
+# no longer the primary, on top of the ones the driver already reports as
+# disconnects. After a failover the old primary answers writes with 25006
+FAILOVER_SQLSTATES = {
+    "25006",  # read_only_sql_transaction
+    "57P01",  # admin_shutdown
+    "57P02",  # crash_shutdown
+    "57P03",  # cannot_connect_now
+}
+
+_hooks_installed = False
+
+
+def engine_options(config):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings
+    Each worker process has its own pool, sized by default to the threads of
+    one gunicorn worker, and capped so that all workers together stay under
+    DB_MAX_CONNECTIONS when it is set
+    """
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    options = {
+        "pool_pre_ping": config.get("DB_POOL_PRE_PING", True),
+        "pool_recycle": config.get("DB_POOL_RECYCLE", 1800),
+    }
+
+    if url.get_backend_name() != "postgresql":
+        return options
+
+    pool_size = config.get("DB_POOL_SIZE", 1)
+    max_overflow = config.get("DB_MAX_OVERFLOW", 2)
+
+    max_connections = config.get("DB_MAX_CONNECTIONS")
+    if max_connections:
+        per_worker = max(max_connections // config.get("WORKER_PROCESSES", 1), 1)
+        pool_size = min(pool_size, per_worker)
+        max_overflow = max(min(max_overflow, per_worker - pool_size), 0)
+
+    connect_args = {"connect_timeout": config.get("DB_CONNECT_TIMEOUT", 5)}
+    statement_timeout = config.get("DB_STATEMENT_TIMEOUT_MS")
+
+    if config.get("DB_PGBOUNCER"):
+        # Transaction pooling runs each transaction on any server connection,
+        # so prepared statements would not be found there. Startup options are
+        # rejected too: set statement_timeout on the database role instead
+        if url.get_driver_name() == "psycopg":
+            connect_args["prepare_threshold"] = None
+    elif statement_timeout:
+        connect_args["options"] = f"-c statement_timeout={statement_timeout}"
+
+    options.update(
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=config.get("DB_POOL_TIMEOUT", 10),
+        pool_use_lifo=True,
+        connect_args=connect_args,
+    )
+    return options
+
+
+def init_database(app):
+    """
+    Configure the engine from the DB_* settings, unless the config already
+    provides SQLALCHEMY_ENGINE_OPTIONS. Must run before db.init_app
+    """
+    if not app.config.get("SQLALCHEMY_ENGINE_OPTIONS"):
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config)
+
+    _install_hooks()
+
+
+def _install_hooks():
+    global _hooks_installed
+    if _hooks_installed:
+        return
+
+    event.listen(Engine, "handle_error", _detect_failover)
+    event.listen(Engine, "connect", _enable_sqlite_foreign_keys)
+    _hooks_installed = True
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """
+    SQLite ignores foreign keys, and so ON DELETE CASCADE, unless enabled on
+    every connection
+    """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def _detect_failover(context):
+    """
+    Treat failover errors as disconnects, so the pool drops every connection
+    opened before the failure and reconnects on the next checkout
+    """
+    error = context.original_exception
+    sqlstate = getattr(error, "sqlstate", None) or getattr(error, "pgcode", None)
+    if sqlstate in FAILOVER_SQLSTATES:
+        context.is_disconnect = True
+
+
+def lift_statement_timeout(engine):
+    """
+    Run every transaction of this engine without DB_STATEMENT_TIMEOUT_MS, for
+    migrations and maintenance commands that may rightly run for long
+    SET LOCAL only lasts for the transaction, so no pooled or PgBouncer server
+    connection keeps it
+    """
+    if engine.dialect.name != "postgresql" or event.contains(
+        engine, "begin", _disable_statement_timeout
+    ):
+        return
+
+    event.listen(engine, "begin", _disable_statement_timeout)
+
+
+def _disable_statement_timeout(connection):
+    # The driver opens the transaction implicitly, on this first statement
+    cursor = connection.connection.cursor()
+    cursor.execute("SET LOCAL statement_timeout = 0")
+    cursor.close()
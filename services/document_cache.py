@@ -0,0 +1,138 @@
+import threading
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import object_session
+from werkzeug.utils import import_string
+from models import db
+from models.shop_list import ShopListShare
+from models.user import User
+from services.cache import LRUCache
+
+
+class DocumentCache:
+    """
+    Read-through cache of serialized shop list documents, keyed by list ID
+    Each entry remembers the list version it was built from, so a document
+    is only served while the list is still at that version. Mutations also
+    invalidate the entry once their transaction commits, which frees the
+    memory and covers changes that do not bump the version (a sharer
+    renaming their account)
+    """
+
+    KEY_PREFIX = "shop_list_document:"
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.backend = LRUCache()
+        self.hits = 0
+        self.misses = 0
+        self._evictions_reported = 0
+        self._lock = threading.Lock()
+        self._hooks_installed = False
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get("DOCUMENT_CACHE_ENABLED", True)
+        backend = app.config.get("DOCUMENT_CACHE_BACKEND", "memory")
+        max_entries = app.config.get("DOCUMENT_CACHE_MAX_ENTRIES", 1024)
+        ttl = app.config.get("DOCUMENT_CACHE_TTL", 300)
+
+        if backend == "memory":
+            self.backend = LRUCache(max_entries, ttl)
+        else:
+            self.backend = import_string(backend)(max_entries, ttl)
+        self._evictions_reported = 0
+
+        self._install_hooks()
+        app.extensions["document_cache"] = self
+
+    def get(self, shop_list_id, version):
+        """
+        Get the cached document body of a shop list at the given version
+        Returns None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        value = self.backend.get(self.KEY_PREFIX + shop_list_id)
+        body = None
+        if value is not None:
+            cached_version, _, cached_body = value.partition(b":")
+            if int(cached_version) == version:
+                body = cached_body
+
+        with self._lock:
+            if body is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return body
+
+    def set(self, shop_list_id, version, body):
+        """
+        Store the document body of a shop list at the given version
+        """
+        if self.enabled:
+            self.backend.set(self.KEY_PREFIX + shop_list_id, b"%d:%s" % (version, body))
+
+    def invalidate(self, *shop_list_ids):
+        """
+        Drop the cached documents of shop lists once the current transaction
+        commits, nothing is dropped if it rolls back
+        """
+        db.session.info.setdefault("invalidated_documents", set()).update(shop_list_ids)
+
+    def stats(self, reset=False):
+        """
+        Get the hits, misses and evictions counted since the last reset
+        reset starts counting again from zero, the metrics export uses it to
+        add each count to its counters exactly once
+        """
+        with self._lock:
+            evictions = self.backend.evictions
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": evictions - self._evictions_reported,
+            }
+            if reset:
+                self.hits = 0
+                self.misses = 0
+                self._evictions_reported = evictions
+            return stats
+
+    def _install_hooks(self):
+        if self._hooks_installed:
+            return
+
+        event.listen(db.session, "after_commit", self._after_commit)
+        event.listen(db.session, "after_rollback", self._after_rollback)
+        event.listen(User, "after_update", self._after_user_update)
+        self._hooks_installed = True
+
+    def _after_commit(self, session):
+        shop_list_ids = session.info.pop("invalidated_documents", None)
+        if shop_list_ids:
+            self.backend.delete(
+                [self.KEY_PREFIX + shop_list_id for shop_list_id in shop_list_ids]
+            )
+
+    def _after_rollback(self, session):
+        session.info.pop("invalidated_documents", None)
+
+    def _after_user_update(self, mapper, connection, user):
+        # Shared lists show their sharers' usernames
+        if not inspect(user).attrs.username.history.has_changes():
+            return
+
+        shop_list_ids = connection.execute(
+            select(ShopListShare.shop_list_id).where(ShopListShare.user_id == user.id)
+        ).scalars()
+        object_session(user).info.setdefault("invalidated_documents", set()).update(
+            shop_list_ids
+        )
+
+
+document_cache = DocumentCache()
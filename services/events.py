@@ -0,0 +1,293 @@
+import json
+import queue
+import sys
+import threading
+import time
+from sqlalchemy import event, text
+from models import db
+
+
+def is_evented():
+    """
+    Check whether gevent has patched threading in this process, so a waiting
+    subscriber only holds a greenlet instead of a request thread
+    """
+    monkey = sys.modules.get("gevent.monkey")
+    return monkey is not None and monkey.is_module_patched("threading")
+
+
+class EventStreamsBusy(Exception):
+    """
+    Raised when this process already serves as many event streams as it may
+    """
+
+    def __init__(self, retry_after):
+        super().__init__("Too many open event streams")
+        self.retry_after = retry_after
+
+
+class Subscription:
+    """
+    A subscriber's bounded queue of events for one shop list
+    When a slow subscriber lets the queue fill up, further events are dropped
+    and the subscription is marked as overflowed, so the stream can tell the
+    client to resynchronise instead of silently missing changes
+    """
+
+    def __init__(self, broker, channel, max_queue):
+        self.broker = broker
+        self.channel = channel
+        self.overflowed = False
+        self._queue = queue.Queue(maxsize=max_queue)
+
+    def put(self, shop_list_event):
+        try:
+            self._queue.put_nowait(shop_list_event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """
+        Wait for the next event, returns None on timeout
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    """
+    Base pub/sub backend, fans events out to the subscribers of this process
+    When max_subscribers is set, at most that many are admitted at once and
+    further ones fail fast with EventStreamsBusy
+    """
+
+    def __init__(self, max_queue=100, max_subscribers=None, retry_after=5):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self.retry_after = retry_after
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def publish(self, events):
+        """
+        Deliver committed events, each a dict with at least listId and type
+        """
+        raise NotImplementedError
+
+    def before_commit(self, session, events):
+        """
+        Hook run inside the committing transaction
+        """
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.max_queue)
+        with self._lock:
+            if (
+                self.max_subscribers is not None
+                and self._subscriber_count() >= self.max_subscribers
+            ):
+                raise EventStreamsBusy(self.retry_after)
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return self._subscriber_count()
+
+    def _subscriber_count(self):
+        return sum(len(subs) for subs in self._subscriptions.values())
+
+    def _dispatch(self, shop_list_event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(shop_list_event["listId"], ()))
+        for subscription in subscriptions:
+            subscription.put(shop_list_event)
+
+
+class InProcessBroker(EventBroker):
+    """
+    Delivers events to subscribers in the same process, for tests and single
+    worker deployments
+    """
+
+    def publish(self, events):
+        for shop_list_event in events:
+            self._dispatch(shop_list_event)
+
+
+class PostgresBroker(EventBroker):
+    """
+    Delivers events across workers and hosts through Postgres LISTEN/NOTIFY
+    Events are sent with pg_notify inside the committing transaction, so they
+    are only delivered if the change commits, one notification per event to
+    stay under the NOTIFY payload limit. Each process keeps one
+    dedicated listening connection, outside the SQLAlchemy pool, that feeds
+    its local subscribers. Under gevent the listener is a greenlet too, and
+    psycopg waits on the connection cooperatively
+    """
+
+    CHANNEL = "shop_list_events"
+    # PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+    MAX_PAYLOAD_BYTES = 7999
+
+    def __init__(self, dsn, max_queue=100, max_subscribers=None, retry_after=5):
+        super().__init__(max_queue, max_subscribers, retry_after)
+        self.dsn = dsn
+        self._listener = None
+
+    def before_commit(self, session, events):
+        for shop_list_event in events:
+            session.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self.CHANNEL, "payload": self._payload(shop_list_event)},
+            )
+
+    def _payload(self, shop_list_event):
+        """
+        Serialize an event for NOTIFY
+        An event too large for it is sent with only its type, list and
+        version, which still tells clients to fetch the changes
+        """
+        payload = json.dumps(shop_list_event, separators=(",", ":"))
+        if len(payload.encode()) > self.MAX_PAYLOAD_BYTES:
+            payload = json.dumps(
+                {key: shop_list_event[key] for key in ("type", "listId", "version")},
+                separators=(",", ":"),
+            )
+        return payload
+
+    def publish(self, events):
+        # Delivered by the listener thread once Postgres relays the NOTIFY
+        pass
+
+    def subscribe(self, channel):
+        self._ensure_listener()
+        return super().subscribe(channel)
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(
+                    target=self._listen, name="shop-list-events", daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self):
+        import psycopg
+
+        while True:
+            try:
+                with psycopg.connect(self.dsn, autocommit=True) as connection:
+                    connection.execute(f"LISTEN {self.CHANNEL}")
+                    while True:
+                        for notify in connection.notifies(timeout=5):
+                            self._dispatch(json.loads(notify.payload))
+            except Exception as e:
+                print(f"Shop list event listener error: {e}")
+                time.sleep(1)
+
+
+class EventBus:
+    """
+    Collects events raised by service mutations and hands them to the
+    configured broker once their transaction commits
+    """
+
+    def __init__(self, app=None):
+        self.broker = InProcessBroker()
+        self.heartbeat_interval = 15
+        self._session_hooks_installed = False
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get("EVENTS_BACKEND", "memory")
+        max_streams = app.config.get("EVENTS_MAX_STREAMS")
+        if max_streams is None and not is_evented():
+            # Every stream would hold one of the worker's request threads
+            max_streams = max(1, app.config.get("WORKER_THREADS", 1) - 1)
+        limits = {
+            "max_queue": app.config.get("EVENTS_MAX_QUEUE", 100),
+            "max_subscribers": max_streams,
+            "retry_after": app.config.get("EVENTS_RETRY_AFTER", 5),
+        }
+
+        if backend == "postgres":
+            with app.app_context():
+                if db.engine.dialect.name != "postgresql":
+                    raise RuntimeError(
+                        "EVENTS_BACKEND=postgres needs a PostgreSQL database"
+                    )
+                url = db.engine.url.set(drivername="postgresql")
+            self.broker = PostgresBroker(
+                url.render_as_string(hide_password=False), **limits
+            )
+        elif app.config.get("WORKER_PROCESSES", 1) > 1:
+            # Events would only reach the subscribers of the publishing worker
+            raise RuntimeError(
+                "EVENTS_BACKEND=memory only works with a single worker process, "
+                "use EVENTS_BACKEND=postgres"
+            )
+        else:
+            self.broker = InProcessBroker(**limits)
+
+        self.heartbeat_interval = app.config.get(
+            "EVENTS_HEARTBEAT_INTERVAL", self.heartbeat_interval
+        )
+        self._install_session_hooks()
+        app.extensions["event_bus"] = self
+
+    def publish(self, shop_list_id, event_type, version=None, **data):
+        """
+        Queue an event for a shop list, delivered after the current commit
+        """
+        shop_list_event = {
+            "type": event_type,
+            "listId": shop_list_id,
+            "version": version,
+        }
+        shop_list_event.update(data)
+        db.session.info.setdefault("pending_events", []).append(shop_list_event)
+
+    def subscribe(self, shop_list_id):
+        return self.broker.subscribe(shop_list_id)
+
+    def _install_session_hooks(self):
+        if self._session_hooks_installed:
+            return
+
+        event.listen(db.session, "before_commit", self._before_commit)
+        event.listen(db.session, "after_commit", self._after_commit)
+        event.listen(db.session, "after_rollback", self._after_rollback)
+        self._session_hooks_installed = True
+
+    def _before_commit(self, session):
+        events = session.info.get("pending_events")
+        if events:
+            self.broker.before_commit(session, events)
+
+    def _after_commit(self, session):
+        events = session.info.pop("pending_events", None)
+        if events:
+            self.broker.publish(events)
+
+    def _after_rollback(self, session):
+        session.info.pop("pending_events", None)
+
+
+event_bus = EventBus()
@@ -0,0 +1,85 @@
+from flask import g, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import object_session
+from models import db
+from models.user import User
+from services.cache import LRUCache
+
+
+class IdentityCache:
+    """
+    Resolves session user IDs to user records without a query per request
+    Records are cached in-process for a short TTL, and dropped as soon as a
+    change to the user commits in this process (rename, deletion), so a
+    deleted user's sessions stop working on their next request here and
+    within the TTL everywhere else
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.backend = LRUCache()
+        self._hooks_installed = False
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get("IDENTITY_CACHE_ENABLED", True)
+        self.backend = LRUCache(
+            app.config.get("IDENTITY_CACHE_MAX_ENTRIES", 10000),
+            app.config.get("IDENTITY_CACHE_TTL", 60),
+        )
+        self._install_hooks()
+        app.extensions["identity_cache"] = self
+
+    def resolve(self, user_id):
+        """
+        Get the {"id", "username"} record of a user
+        Looks at the current request, then the cache, then the database
+        Returns None if the user does not exist
+        """
+        if has_app_context():
+            current_user = g.get("current_user")
+            if current_user is not None and current_user["id"] == user_id:
+                return current_user
+
+        identity = self.backend.get(user_id) if self.enabled else None
+        if identity is None:
+            row = db.session.execute(
+                select(User.id, User.username).where(User.id == user_id)
+            ).one_or_none()
+            if row is None:
+                return None
+
+            identity = {"id": row.id, "username": row.username}
+            self.remember(identity)
+
+        return dict(identity)
+
+    def remember(self, identity):
+        if self.enabled:
+            self.backend.set(identity["id"], identity)
+
+    def _install_hooks(self):
+        if self._hooks_installed:
+            return
+
+        event.listen(db.session, "after_commit", self._after_commit)
+        event.listen(db.session, "after_rollback", self._after_rollback)
+        event.listen(User, "after_update", self._after_user_change)
+        event.listen(User, "after_delete", self._after_user_change)
+        self._hooks_installed = True
+
+    def _after_commit(self, session):
+        user_ids = session.info.pop("invalidated_users", None)
+        if user_ids:
+            self.backend.delete(user_ids)
+
+    def _after_rollback(self, session):
+        session.info.pop("invalidated_users", None)
+
+    def _after_user_change(self, mapper, connection, user):
+        object_session(user).info.setdefault("invalidated_users", set()).add(user.id)
+
+
+identity_cache = IdentityCache()
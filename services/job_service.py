@@ -0,0 +1,180 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, or_, select, update
+from models import db
+from models.job import Job
+
+
+class JobService:
+    # Handlers by job kind, each takes the job payload and returns a JSON
+    # serializable result. Raising marks the attempt as failed
+    handlers = {}
+
+    @staticmethod
+    def register(kind, handler):
+        """
+        Register the function that runs jobs of the given kind
+        """
+        JobService.handlers[kind] = handler
+
+    @staticmethod
+    def enqueue(kind, payload, owner_id=None, max_attempts=None):
+        """
+        Queue a job, without committing
+        The job becomes visible to workers when the caller commits, together
+        with the change that needed it
+        """
+        if max_attempts is None:
+            max_attempts = current_app.config.get("JOB_MAX_ATTEMPTS", 3)
+
+        job = Job(
+            kind=kind,
+            payload=payload,
+            owner_id=owner_id,
+            max_attempts=max_attempts,
+            run_at=datetime.utcnow(),
+        )
+        db.session.add(job)
+        return job
+
+    @staticmethod
+    def has_pending(kind, **payload):
+        """
+        Whether a job of the given kind is queued or running with a payload
+        holding the given string values
+        """
+        stmt = select(Job.id).where(
+            Job.kind == kind,
+            Job.status.in_((Job.QUEUED, Job.RUNNING)),
+            *(Job.payload[key].as_string() == value for key, value in payload.items()),
+        )
+        return db.session.execute(stmt.limit(1)).first() is not None
+
+    @staticmethod
+    def get_job(job_id):
+        """
+        Retrieve a job by its ID
+        """
+        return db.session.get(Job, job_id)
+
+    @staticmethod
+    def _claimable(now):
+        """
+        Jobs that are due, or whose worker stopped without finishing them
+        within JOB_LEASE_SECONDS
+        """
+        lease = timedelta(seconds=current_app.config.get("JOB_LEASE_SECONDS", 900))
+        return or_(
+            and_(Job.status == Job.QUEUED, Job.run_at <= now),
+            and_(Job.status == Job.RUNNING, Job.locked_at < now - lease),
+        )
+
+    @staticmethod
+    def claim_next(worker_id):
+        """
+        Claim the next due job for a worker and commit
+        On PostgreSQL rows locked by other workers are skipped. SQLite has no
+        row locks: the conditional UPDATE only succeeds for one worker and the
+        others move on
+        Returns the claimed job, or None if there is nothing to run
+        """
+        now = datetime.utcnow()
+        claimable = JobService._claimable(now)
+
+        try:
+            job_id = db.session.execute(
+                select(Job.id)
+                .where(claimable)
+                .order_by(Job.run_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            ).scalar_one_or_none()
+            if job_id is None:
+                db.session.rollback()
+                return None
+
+            claimed = db.session.execute(
+                update(Job)
+                .where(Job.id == job_id, claimable)
+                .values(
+                    status=Job.RUNNING,
+                    locked_by=worker_id,
+                    locked_at=now,
+                    attempts=Job.attempts + 1,
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error claiming job: {e}")
+            return None
+
+        if not claimed:
+            return None
+
+        job = db.session.get(Job, job_id, populate_existing=True)
+
+        # A job still running after its last attempt took its worker down
+        if job.attempts > job.max_attempts:
+            JobService._finish(
+                job, Job.FAILED, error="Worker stopped while running the job"
+            )
+            return None
+
+        return job
+
+    @staticmethod
+    def run(job):
+        """
+        Run a claimed job with its handler and record the outcome
+        Failed attempts are retried with exponential backoff until
+        max_attempts is reached
+        Returns True if the job succeeded
+        """
+        handler = JobService.handlers.get(job.kind)
+
+        try:
+            if handler is None:
+                raise LookupError(f"No handler for job kind {job.kind}")
+            result = handler(job.payload)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error running job {job.id} ({job.kind}): {e}")
+
+            if job.attempts >= job.max_attempts:
+                JobService._finish(job, Job.FAILED, error=str(e))
+            else:
+                delay = current_app.config.get("JOB_RETRY_DELAY", 10)
+                JobService._finish(
+                    job,
+                    Job.QUEUED,
+                    error=str(e),
+                    run_at=datetime.utcnow()
+                    + timedelta(seconds=delay * 2 ** (job.attempts - 1)),
+                )
+            return False
+
+        JobService._finish(job, Job.SUCCEEDED, result=result)
+        return True
+
+    @staticmethod
+    def _finish(job, status, **values):
+        """
+        Release a claimed job with its new status
+        Nothing is written if another worker has reclaimed the job meanwhile
+        """
+        if status != Job.QUEUED:
+            values["finished_at"] = datetime.utcnow()
+
+        try:
+            db.session.execute(
+                update(Job)
+                .where(Job.id == job.id, Job.locked_by == job.locked_by)
+                .values(status=status, locked_by=None, locked_at=None, **values)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error updating job {job.id}: {e}")
@@ -0,0 +1,57 @@
+import os
+import socket
+import threading
+from services.job_service import JobService
+
+
+class JobWorker:
+    """
+    Runs queued jobs on a fixed number of threads
+    Every thread claims one job at a time in a fresh application context, so
+    concurrency bounds both the parallel jobs and the database connections
+    this worker uses. Several workers can share the same jobs table
+    """
+
+    def __init__(self, app, concurrency=2, poll_interval=1.0, burst=False):
+        self.app = app
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.burst = burst
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = threading.Event()
+
+    def run(self):
+        """
+        Start the threads and wait until they stop
+        In burst mode every thread stops as soon as the queue is empty
+        """
+        threads = [
+            threading.Thread(
+                target=self._work, args=(f"{self.name}:{index}",), daemon=True
+            )
+            for index in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=self.poll_interval)
+
+    def stop(self):
+        """
+        Let the running jobs finish and claim no new ones
+        """
+        self._stopping.set()
+
+    def _work(self, worker_id):
+        while not self._stopping.is_set():
+            with self.app.app_context():
+                job = JobService.claim_next(worker_id)
+                if job is not None:
+                    JobService.run(job)
+                    continue
+
+            if self.burst:
+                return
+            self._stopping.wait(self.poll_interval)
@@ -0,0 +1,230 @@
+import os
+import time
+from flask import g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from models import db
+from services.document_cache import document_cache
+from services.password_hasher import password_hasher
+from services.query_monitor import query_monitor
+
+# Multiprocess mode is enabled by PROMETHEUS_MULTIPROC_DIR, which must be set
+# before this module is imported (gunicorn.conf.py does it). Every worker then
+# writes its samples to files in that directory and any worker can serve the
+# aggregate
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests served",
+    ["method", "route", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time to build the response of an HTTP request",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent running SQL statements per HTTP request",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being served",
+    ["method", "route"],
+    multiprocess_mode="livesum",
+)
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Database connections checked out of the pool",
+    ["database"],
+    multiprocess_mode="livesum",
+)
+POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Database connections open beyond the pool size",
+    ["database"],
+    multiprocess_mode="livesum",
+)
+POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time a session waited for a pooled database connection",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+DOCUMENT_CACHE_LOOKUPS = Counter(
+    "document_cache_lookups_total",
+    "Shop list document cache lookups",
+    ["result"],
+)
+DOCUMENT_CACHE_EVICTIONS = Counter(
+    "document_cache_evictions_total",
+    "Shop list documents evicted from a full cache",
+)
+PASSWORD_HASH_QUEUE = Gauge(
+    "password_hash_queue_depth",
+    "Password hashing operations running or queued",
+    multiprocess_mode="livesum",
+)
+
+
+class Metrics:
+    """
+    Records Prometheus metrics for requests, the connection pool, the
+    document cache and the password hashing queue
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self._session_hooks_installed = False
+        self._instrumented_engines = set()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get("METRICS_ENABLED", True)
+        if not self.enabled:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+        with app.app_context():
+            for bind_key, engine in db.engines.items():
+                self._instrument_pool(engine, bind_key or "primary")
+        self._install_session_hooks()
+        app.extensions["metrics"] = self
+
+    def render(self):
+        """
+        Render all metrics in the Prometheus text format
+        Returns a (body, content_type) tuple
+        """
+        PASSWORD_HASH_QUEUE.set(password_hasher.pending)
+        self._record_document_cache()
+
+        registry = REGISTRY
+        if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    @staticmethod
+    def _labels():
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        return request.method, route
+
+    def _before_request(self):
+        g.metrics_started_at = time.perf_counter()
+        g.metrics_labels = self._labels()
+        IN_PROGRESS.labels(*g.metrics_labels).inc()
+
+    def _after_request(self, response):
+        started_at = g.get("metrics_started_at")
+        if started_at is None:
+            return response
+
+        method, route = g.metrics_labels
+        REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - started_at)
+        REQUESTS.labels(method, route, str(response.status_code)).inc()
+
+        stats = query_monitor.current_stats()
+        if stats is not None:
+            REQUEST_DB_TIME.labels(method, route).observe(stats.duration)
+
+        # Sampled at the end of each request, the hasher and the document cache
+        # have no hook of their own
+        PASSWORD_HASH_QUEUE.set(password_hasher.pending)
+        self._record_document_cache()
+        return response
+
+    @staticmethod
+    def _record_document_cache():
+        stats = document_cache.stats(reset=True)
+        DOCUMENT_CACHE_LOOKUPS.labels("hit").inc(stats["hits"])
+        DOCUMENT_CACHE_LOOKUPS.labels("miss").inc(stats["misses"])
+        DOCUMENT_CACHE_EVICTIONS.inc(stats["evictions"])
+
+    def _teardown_request(self, error=None):
+        labels = g.pop("metrics_labels", None)
+        if labels is not None:
+            IN_PROGRESS.labels(*labels).dec()
+
+    def _instrument_pool(self, engine, database):
+        """
+        Track the connections of an engine's pool, labelled with database
+        (primary or the replica bind key)
+        """
+        if id(engine) in self._instrumented_engines or not hasattr(
+            engine.pool, "checkedout"
+        ):
+            return
+
+        def update(returning=False):
+            # engine.dispose() replaces the pool and carries these listeners
+            # over, so read whichever pool the engine uses now
+            pool = engine.pool
+            checked_out = pool.checkedout()
+            overflow = pool.overflow()
+            if returning:
+                # checkin fires before the pool takes the connection back, a
+                # full pool then closes it instead of keeping it
+                checked_out -= 1
+                if pool.checkedin() >= pool.size():
+                    overflow -= 1
+            POOL_CHECKED_OUT.labels(database).set(checked_out)
+            POOL_OVERFLOW.labels(database).set(max(overflow, 0))
+
+        def on_checkout(*args):
+            update()
+
+        def on_checkin(*args):
+            update(returning=True)
+
+        event.listen(engine.pool, "checkout", on_checkout)
+        event.listen(engine.pool, "checkin", on_checkin)
+        self._instrumented_engines.add(id(engine))
+
+    def _install_session_hooks(self):
+        # The wait for a pooled connection happens between the first statement
+        # of a transaction and the session beginning on a connection
+        if self._session_hooks_installed:
+            return
+
+        event.listen(db.session, "do_orm_execute", self._before_execute)
+        event.listen(db.session, "after_begin", self._after_begin)
+        event.listen(db.session, "after_transaction_end", self._after_transaction_end)
+        self._session_hooks_installed = True
+
+    def _before_execute(self, orm_execute_state):
+        session = orm_execute_state.session
+        if not session.info.get("has_connection"):
+            session.info.setdefault("checkout_started_at", time.perf_counter())
+
+    def _after_begin(self, session, transaction, connection):
+        session.info["has_connection"] = True
+        started_at = session.info.pop("checkout_started_at", None)
+        if started_at is not None:
+            POOL_WAIT.observe(time.perf_counter() - started_at)
+
+    def _after_transaction_end(self, session, transaction):
+        if transaction.parent is None:
+            session.info.pop("has_connection", None)
+            session.info.pop("checkout_started_at", None)
+
+
+metrics = Metrics()
@@ -0,0 +1,66 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(key, id):
+    """
+    Encode the (key, id) sort key of the last row of a page as an opaque cursor
+    Keys are either datetimes or strings, string keys are tagged with "s"
+    """
+    if isinstance(key, datetime):
+        payload = [key.isoformat(), id]
+    else:
+        payload = [key, id, "s"]
+    payload = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor made by encode_cursor
+    Returns the (key, id) tuple, with the key as a datetime or a string
+    Raises ValueError if the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if len(payload) == 3 and payload[2] == "s" and isinstance(payload[0], str):
+            return payload[0], str(payload[1])
+        key, id = payload
+        return datetime.fromisoformat(key), str(id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def after_cursor(key_column, id_column, cursor):
+    """
+    Build a WHERE clause selecting the rows that come after a decoded cursor
+    in (key, id) order
+    """
+    key, id = cursor
+    return or_(
+        key_column > key,
+        and_(key_column == key, id_column > id),
+    )
+
+
+def paginate(query, key_column, id_column, limit, cursor=None):
+    """
+    Fetch one keyset page of a query ordered by (key, id), where the key
+    column is a datetime or string column such as created_at or rank
+    Returns the rows of the page and the cursor of the next page, or None
+    when this is the last page
+    """
+    if cursor is not None:
+        query = query.filter(after_cursor(key_column, id_column, cursor))
+
+    rows = query.order_by(key_column, id_column).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(getattr(rows[-1], key_column.key), rows[-1].id)
+
+    return rows, next_cursor
@@ -0,0 +1,141 @@
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import bcrypt
+
+_ROUNDS_PATTERN = re.compile(r"^\$2[abxy]?\$(\d{2})\$")
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when the password hashing queue is full
+    """
+
+    def __init__(self, retry_after):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+def _hash_password(password_bytes, rounds):
+    return bcrypt.hashpw(password_bytes, bcrypt.gensalt(rounds)).decode()
+
+
+def _check_password(password_bytes, hash_bytes):
+    return bcrypt.checkpw(password_bytes, hash_bytes)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a bounded worker pool instead of the request thread
+    At most workers + queue_size operations are admitted at once, and never
+    so many that they hold every request thread of the process (one is kept
+    for requests that do not hash). Further requests fail fast with
+    PasswordHasherBusy
+    """
+
+    def __init__(self, app=None):
+        self.rounds = 12
+        self.executor_kind = "thread"
+        self.workers = 2
+        self.queue_size = 8
+        self.retry_after = 1
+        self.request_threads = 1
+        self._executor = None
+        self._slots = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.rounds = app.config.get("BCRYPT_ROUNDS", self.rounds)
+        self.executor_kind = app.config.get(
+            "PASSWORD_HASH_EXECUTOR", self.executor_kind
+        )
+        self.workers = app.config.get("PASSWORD_HASH_WORKERS", self.workers)
+        self.queue_size = app.config.get("PASSWORD_HASH_QUEUE_SIZE", self.queue_size)
+        self.retry_after = app.config.get("PASSWORD_HASH_RETRY_AFTER", self.retry_after)
+        self.request_threads = app.config.get("WORKER_THREADS", self.request_threads)
+        self.shutdown()
+        app.extensions["password_hasher"] = self
+
+    @property
+    def admission_limit(self):
+        """
+        Number of hashing operations admitted at once
+        """
+        limit = self.workers + self.queue_size
+        if self.request_threads > 1:
+            limit = min(limit, self.request_threads - 1)
+        return limit
+
+    @property
+    def pending(self):
+        """
+        Number of hashing operations running or waiting in the queue
+        """
+        return self._pending
+
+    def hash(self, password):
+        """
+        Hash a password at the configured bcrypt cost
+        """
+        return self._run(_hash_password, password.encode(), self.rounds)
+
+    def verify(self, password, password_hash):
+        """
+        Check a password against a bcrypt hash
+        """
+        return self._run(_check_password, password.encode(), password_hash.encode())
+
+    def needs_rehash(self, password_hash):
+        """
+        Whether a hash was made with a different cost than the configured one
+        """
+        match = _ROUNDS_PATTERN.match(password_hash)
+        return match is None or int(match.group(1)) != self.rounds
+
+    def shutdown(self):
+        """
+        Stop the worker pool, a new one is started on the next operation
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._slots = None
+
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _get_executor(self):
+        # The pool is created lazily so it is started in each forked worker
+        # rather than in a preloading parent process
+        with self._lock:
+            if self._executor is None:
+                if self.executor_kind == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="bcrypt"
+                    )
+                self._slots = threading.BoundedSemaphore(self.admission_limit)
+            return self._executor, self._slots
+
+    def _run(self, function, *args):
+        executor, slots = self._get_executor()
+
+        if not slots.acquire(blocking=False):
+            raise PasswordHasherBusy(self.retry_after)
+
+        with self._lock:
+            self._pending += 1
+
+        try:
+            return executor.submit(function, *args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+            slots.release()
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,129 @@
+import csv
+import io
+import json
+
+# Import and export formats with their content types
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+CSV_FIELDS = ["id", "name", "strikeout"]
+CSV_TRUE = {"1", "true", "yes", "y", "x"}
+CSV_FALSE = {"", "0", "false", "no", "n"}
+MAX_NAME_LENGTH = 100
+
+
+class ImportFormatError(ValueError):
+    """
+    Raised for an import row that cannot be read, with its line number
+    """
+
+    def __init__(self, line, message):
+        super().__init__(f"Line {line}: {message}" if line else message)
+        self.line = line
+
+
+def format_for(mimetype, requested=None):
+    """
+    Pick the import/export format from an explicit format name or from a
+    content type. Returns None if neither is supported
+    """
+    if requested:
+        return requested if requested in FORMATS else None
+
+    for name, content_type in FORMATS.items():
+        if mimetype == content_type:
+            return name
+    if mimetype in ("application/jsonl", "application/json-lines"):
+        return "ndjson"
+    return None
+
+
+def read_products(stream, data_format, loads=json.loads):
+    """
+    Parse products from a binary stream, one row at a time
+    Yields a (name, strikeout) tuple per product, blank lines are skipped
+    NDJSON lines are parsed with the given JSON loads function
+    Raises ImportFormatError on the first invalid row
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if data_format == "csv":
+            yield from _read_csv(text)
+        else:
+            yield from _read_ndjson(text, loads)
+    except UnicodeDecodeError:
+        raise ImportFormatError(None, "File is not valid UTF-8")
+
+
+def _read_ndjson(text, loads):
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            item = loads(line)
+        except ValueError:
+            raise ImportFormatError(line_number, "Invalid JSON")
+
+        if not isinstance(item, dict):
+            raise ImportFormatError(line_number, "Expected a JSON object")
+
+        strikeout = item.get("strikeout", False)
+        if not isinstance(strikeout, bool):
+            raise ImportFormatError(line_number, "strikeout must be true or false")
+
+        yield _check_name(line_number, item.get("name")), strikeout
+
+
+def _read_csv(text):
+    reader = csv.DictReader(text)
+    if reader.fieldnames is None or "name" not in reader.fieldnames:
+        raise ImportFormatError(1, "Missing required column: name")
+
+    for row in reader:
+        line_number = reader.line_num
+        if not any(row.values()):
+            continue
+
+        strikeout = (row.get("strikeout") or "").strip().lower()
+        if strikeout not in CSV_TRUE | CSV_FALSE:
+            raise ImportFormatError(line_number, "strikeout must be true or false")
+
+        yield _check_name(line_number, row["name"]), strikeout in CSV_TRUE
+
+
+def _check_name(line_number, name):
+    if not isinstance(name, str) or not name.strip():
+        raise ImportFormatError(line_number, "Product name cannot be empty")
+    if len(name) > MAX_NAME_LENGTH:
+        raise ImportFormatError(
+            line_number, f"Product name is longer than {MAX_NAME_LENGTH} characters"
+        )
+    return name
+
+
+def write_products(products, data_format, dumps, chunk_size=64 * 1024):
+    """
+    Serialize product documents, yielding text chunks of about chunk_size
+    NDJSON lines are written with the given JSON dumps function
+    """
+    buffer = io.StringIO()
+    if data_format == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS, lineterminator="\n")
+        writer.writeheader()
+
+        def write(product):
+            strikeout = "true" if product["strikeout"] else "false"
+            writer.writerow({**product, "strikeout": strikeout})
+
+    else:
+
+        def write(product):
+            buffer.write(dumps(product))
+            buffer.write("\n")
+
+    for product in products:
+        write(product)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
@@ -1,24 +1,65 @@
+import uuid
+from itertools import islice
+from flask import current_app
+from sqlalchemy import delete, func, insert, not_, select, update
 from models import db
-from models.shop_list import Product, ShopList
+from models.shop_list import Product, ShopList, Tombstone
 from services.shop_list_service import ShopListService
+from services.sql_helpers import copy_rows, supports_copy, supports_returning
+from services.product_io import ImportFormatError
+from services.events import event_bus
+from services.document_cache import document_cache
+from services.job_service import JobService
+from services.pagination import paginate
+from services.ranks import rank_between, ranks_after, spread_ranks
 from datetime import datetime
 
 
 class ProductService:
+    REBALANCE_JOB = "products.rebalance"
+
+    # Column order of the rows written by import_shop_list
+    IMPORT_COLUMNS = (
+        "id",
+        "name",
+        "strikeout",
+        "shop_list_id",
+        "rank",
+        "version",
+        "created_at",
+        "updated_at",
+    )
+
     @staticmethod
     def add_product(shop_list_id, name):
         """
-        Add a product to a shop list
+        Add a product to the end of a shop list
+        The list's product counters are raised by the version bump itself
         Returns the created product if successful, None otherwise
         """
-        shop_list = ShopListService.get_shop_list_by_id(shop_list_id)
-        if not shop_list:
-            return None
-
         try:
-            product = Product(name=name, shop_list_id=shop_list_id, strikeout=False)
+            version = ShopListService.bump_version(
+                shop_list_id, products=1, open_products=1
+            )
+            if version is None:
+                db.session.rollback()
+                return None
+
+            rank = rank_between(ShopListService.last_product_rank(shop_list_id), None)
+            product = Product(
+                name=name,
+                shop_list_id=shop_list_id,
+                strikeout=False,
+                rank=rank,
+                version=version,
+            )
 
             db.session.add(product)
+            db.session.flush()
+            document_cache.invalidate(shop_list_id)
+            event_bus.publish(
+                shop_list_id, "product.created", version, product=product.to_dict()
+            )
             db.session.commit()
             return product
         except Exception as e:
@@ -36,78 +77,683 @@ class ProductService:
     @staticmethod
     def get_products_for_shop_list(shop_list_id):
         """
-        Get all products in a shop list
+        Get all products in a shop list, in display order
         """
         return (
             Product.query.filter_by(shop_list_id=shop_list_id)
-            .order_by(Product.created_at)
+            .order_by(Product.rank, Product.id)
             .all()
         )
 
     @staticmethod
-    def update_product(product_id, name=None, strikeout=None):
+    def get_product_documents_for_shop_list(shop_list_id):
+        """
+        Get the serialized form of all products in a shop list from plain
+        column reads, without building ORM objects
+        """
+        rows = db.session.execute(
+            select(Product.id, Product.name, Product.strikeout)
+            .where(Product.shop_list_id == shop_list_id)
+            .order_by(Product.rank, Product.id)
+        )
+        return [
+            {"id": product_id, "name": name, "strikeout": strikeout}
+            for product_id, name, strikeout in rows
+        ]
+
+    @staticmethod
+    def get_products_page(shop_list_id, limit, cursor=None):
+        """
+        Get one keyset page of the products in a shop list, ordered by
+        (rank, id)
+        Returns the products and the cursor of the next page (None at the end)
+        """
+        return paginate(
+            Product.query.filter_by(shop_list_id=shop_list_id),
+            Product.rank,
+            Product.id,
+            limit,
+            cursor,
+        )
+
+    @staticmethod
+    def _parent_clause(user_id=None, lock=False):
+        """
+        Build a WHERE clause on products that holds while the product's shop
+        list is not deleted and, when user_id is given, the user may write to it
+        With lock, evaluating it takes the list's row lock, like bump_version
+        """
+        parent = select(ShopList.id).where(
+            ShopList.id == Product.shop_list_id, ShopList.deleted_at.is_(None)
+        )
+        if user_id is not None:
+            parent = parent.where(ShopListService.write_access_clause(user_id))
+        if lock:
+            parent = parent.with_for_update()
+        return parent.exists()
+
+    @staticmethod
+    def _next_parent_version():
+        """
+        The next version of a product's shop list, as a subquery for a product
+        UPDATE. It takes the list's row lock before the product row is
+        written, in the same order as every bump_version caller, so the
+        bump_version that follows in the transaction returns this version
+        """
+        return (
+            select(ShopList.version + 1)
+            .where(ShopList.id == Product.shop_list_id)
+            .with_for_update()
+            .scalar_subquery()
+        )
+
+    @staticmethod
+    def _update_product(product_id, values, version, shop_list_id=None, where=()):
+        """
+        Apply values to a product in a single UPDATE statement, without committing
+        The product is stamped with the given shop list version, and when
+        shop_list_id is given it must belong to that list. where adds further
+        conditions the row must meet
+        Returns the updated product, or None if no row matched
+        """
+        stmt = (
+            update(Product)
+            .where(Product.id == product_id, *where)
+            .values(updated_at=datetime.utcnow(), version=version, **values)
+            .execution_options(synchronize_session=False)
+        )
+        if shop_list_id is not None:
+            stmt = stmt.where(Product.shop_list_id == shop_list_id)
+
+        if supports_returning("update"):
+            product = db.session.execute(
+                stmt.returning(Product),
+                execution_options={"populate_existing": True},
+            ).scalar_one_or_none()
+        else:
+            result = db.session.execute(stmt)
+            product = None
+            if result.rowcount:
+                product = db.session.get(Product, product_id, populate_existing=True)
+
+        return product
+
+    @staticmethod
+    def _write_product(product_id, values, user_id, where=()):
+        """
+        Update a product with one UPDATE that also stamps it with the next
+        version of its list, without committing
+        Returns the updated product, or None if no row matched
+        """
+        return ProductService._update_product(
+            product_id,
+            values,
+            ProductService._next_parent_version(),
+            where=(ProductService._parent_clause(user_id), *where),
+        )
+
+    @staticmethod
+    def _set_strikeout(product_id, values, strikeout, user_id):
+        """
+        Update a product to an explicit strikeout, without committing
+        RETURNING only has the new row, so whether the product was struck
+        before comes from guarded compare-and-set UPDATEs: one matches only
+        a change of strikeout, the other only an unchanged one. The more
+        likely guess runs first, a rename usually keeps the strikeout
+        Returns the updated product and its change to the list's open count,
+        (None, 0) if no row matched
+        """
+        was_struck = Product.strikeout.is_(True)
+        was_open = Product.strikeout.is_not(True)
+        changed = (was_open if strikeout else was_struck, -1 if strikeout else 1)
+        unchanged = (was_struck if strikeout else was_open, 0)
+        guesses = (unchanged, changed) if "name" in values else (changed, unchanged)
+
+        # The third try covers a concurrent change between the first two
+        for guard, open_delta in (*guesses, guesses[0]):
+            product = ProductService._write_product(
+                product_id, {**values, "strikeout": strikeout}, user_id, (guard,)
+            )
+            if product is not None:
+                return product, open_delta
+
+        return None, 0
+
+    @staticmethod
+    def _apply_update(product_id, values, user_id, strikeout=None):
+        """
+        Update a product, then bump its list with the change to its open
+        count: two statements in one transaction
+        Returns the updated product, or None if nothing was changed
+        """
+        if strikeout is None:
+            product = ProductService._write_product(product_id, values, user_id)
+            open_delta = 0
+        else:
+            product, open_delta = ProductService._set_strikeout(
+                product_id, values, strikeout, user_id
+            )
+
+        return ProductService._finish_update(product, open_delta)
+
+    @staticmethod
+    def _finish_update(product, open_delta):
+        """
+        Bump the list of an updated product, which it was stamped with the
+        next version of, then publish the change and commit
+        Returns the product, or None if the list could not be bumped
+        """
+        version = None
+        if product is not None:
+            version = ShopListService.bump_version(
+                product.shop_list_id, open_products=open_delta
+            )
+
+        if version is None:
+            db.session.rollback()
+            return None
+
+        if version != product.version:
+            raise RuntimeError(
+                f"Shop list {product.shop_list_id} is at version {version}, "
+                f"the product was stamped with {product.version}"
+            )
+
+        document_cache.invalidate(product.shop_list_id)
+        event_bus.publish(
+            product.shop_list_id, "product.updated", version, product=product.to_dict()
+        )
+        db.session.commit()
+        return product
+
+    @staticmethod
+    def update_product(product_id, name=None, strikeout=None, user_id=None):
         """
         Update a product
         Parameters:
             product_id: The ID of the product to update
             name: New name (optional)
             strikeout: New strikeout status (optional)
+            user_id: Only update if this user has Write access (optional)
         Returns the updated product if successful, None otherwise
         """
-        product = ProductService.get_product_by_id(product_id)
-        if not product:
-            return None
+        values = {}
+        if name is not None:
+            values["name"] = name
 
         try:
-            if name is not None:
-                product.name = name
-
-            if strikeout is not None:
-                product.strikeout = strikeout
-
-            product.updated_at = datetime.utcnow()
-            db.session.commit()
-            return product
+            return ProductService._apply_update(product_id, values, user_id, strikeout)
         except Exception as e:
             db.session.rollback()
             print(f"Error updating product: {e}")
             return None
 
     @staticmethod
-    def delete_product(product_id):
+    def delete_product(product_id, user_id=None):
         """
-        Delete a product
+        Delete a product and leave a tombstone for delta sync clients
+        The DELETE takes the list's row lock first, then the list is bumped
+        with the change to its product counters
+        When user_id is given, only delete if this user has Write access
         Returns True if successful, False otherwise
         """
-        product = ProductService.get_product_by_id(product_id)
-        if not product:
-            return False
+        stmt = (
+            delete(Product)
+            .where(
+                Product.id == product_id,
+                ProductService._parent_clause(user_id, lock=True),
+            )
+            .execution_options(synchronize_session=False)
+        )
 
         try:
-            db.session.delete(product)
+            if supports_returning("delete"):
+                row = db.session.execute(
+                    stmt.returning(Product.shop_list_id, Product.strikeout)
+                ).one_or_none()
+            else:
+                row = db.session.execute(
+                    select(Product.shop_list_id, Product.strikeout).where(
+                        Product.id == product_id
+                    )
+                ).one_or_none()
+                if not db.session.execute(stmt).rowcount:
+                    row = None
+
+            version = None
+            if row is not None:
+                shop_list_id, strikeout = row
+                version = ShopListService.bump_version(
+                    shop_list_id,
+                    products=-1,
+                    open_products=0 if strikeout else -1,
+                )
+
+            if version is None:
+                db.session.rollback()
+                return False
+
+            ShopListService.record_tombstones(
+                shop_list_id, Tombstone.PRODUCT, [product_id], version
+            )
+            document_cache.invalidate(shop_list_id)
+            event_bus.publish(
+                shop_list_id, "product.deleted", version, productId=product_id
+            )
             db.session.commit()
-            return True
         except Exception as e:
             db.session.rollback()
             print(f"Error deleting product: {e}")
             return False
 
+        return True
+
     @staticmethod
-    def toggle_product_strikeout(product_id):
+    def apply_batch(shop_list_id, creates, updates, deletes):
         """
-        Toggle the strikeout status of a product
-        Returns the updated product if successful, None otherwise
+        Apply many product changes to a shop list in a single transaction
+        Parameters:
+            shop_list_id: The ID of the shop list the products belong to
+            creates: Names of the products to add
+            updates: (product_id, name, strikeout) tuples
+            deletes: IDs of the products to delete
+        Returns a (created, updated, deleted) tuple aligned with the inputs:
+        the created products, the updated products (None when not found) and
+        whether each delete removed a product. Returns None if the batch failed
         """
-        product = ProductService.get_product_by_id(product_id)
-        if not product:
+        try:
+            version = ShopListService.bump_version(shop_list_id)
+
+            created = ProductService._insert_products(shop_list_id, creates, version)
+            product_delta = len(created)
+            open_delta = len(created)
+
+            # Current strikeout of the products whose strikeout may change
+            old_strikeouts = {}
+            toggled_ids = [
+                product_id
+                for product_id, _, strikeout in updates
+                if strikeout is not None
+            ]
+            if toggled_ids:
+                old_strikeouts = dict(
+                    db.session.execute(
+                        select(Product.id, Product.strikeout).where(
+                            Product.shop_list_id == shop_list_id,
+                            Product.id.in_(toggled_ids),
+                        )
+                    ).all()
+                )
+
+            updated = []
+            for product_id, name, strikeout in updates:
+                values = {}
+                if name is not None:
+                    values["name"] = name
+                if strikeout is not None:
+                    values["strikeout"] = strikeout
+                product = ProductService._update_product(
+                    product_id, values, version, shop_list_id=shop_list_id
+                )
+                updated.append(product)
+
+                old_strikeout = old_strikeouts.get(product_id)
+                if product is not None and old_strikeout is not None:
+                    if product.strikeout != old_strikeout:
+                        open_delta += 1 if old_strikeout else -1
+                        old_strikeouts[product_id] = product.strikeout
+
+            deleted_ids = set()
+            if deletes:
+                stmt = (
+                    delete(Product)
+                    .where(
+                        Product.shop_list_id == shop_list_id, Product.id.in_(deletes)
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                if supports_returning("delete"):
+                    deleted_rows = db.session.execute(
+                        stmt.returning(Product.id, Product.strikeout)
+                    ).all()
+                else:
+                    deleted_rows = db.session.execute(
+                        select(Product.id, Product.strikeout).where(
+                            Product.shop_list_id == shop_list_id,
+                            Product.id.in_(deletes),
+                        )
+                    ).all()
+                    db.session.execute(stmt)
+
+                deleted_ids = {product_id for product_id, _ in deleted_rows}
+                product_delta -= len(deleted_rows)
+                open_delta -= sum(1 for _, strikeout in deleted_rows if not strikeout)
+
+                if deleted_ids:
+                    ShopListService.record_tombstones(
+                        shop_list_id, Tombstone.PRODUCT, deleted_ids, version
+                    )
+
+            ShopListService.adjust_product_counts(
+                shop_list_id, product_delta, open_delta
+            )
+            document_cache.invalidate(shop_list_id)
+            event_bus.publish(shop_list_id, "products.changed", version)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error applying product batch: {e}")
             return None
 
+        deleted = []
+        for product_id in deletes:
+            deleted.append(product_id in deleted_ids)
+            deleted_ids.discard(product_id)
+
+        return created, updated, deleted
+
+    @staticmethod
+    def _insert_products(shop_list_id, names, version):
+        """
+        Insert products at the end of a shop list with one multi-row INSERT,
+        without committing
+        Returns the created products in the same order as names
+        """
+        if not names:
+            return []
+
+        now = datetime.utcnow()
+        ranks = ranks_after(ShopListService.last_product_rank(shop_list_id), len(names))
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "name": name,
+                "strikeout": False,
+                "shop_list_id": shop_list_id,
+                "rank": rank,
+                "version": version,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for name, rank in zip(names, ranks)
+        ]
+
+        if supports_returning("insert_executemany"):
+            return list(
+                db.session.scalars(
+                    insert(Product).returning(Product, sort_by_parameter_order=True),
+                    rows,
+                )
+            )
+
+        db.session.execute(insert(Product), rows)
+        products = Product.query.filter(
+            Product.id.in_([row["id"] for row in rows])
+        ).all()
+        products_by_id = {product.id: product for product in products}
+        return [products_by_id[row["id"]] for row in rows]
+
+    @staticmethod
+    def import_shop_list(name, owner_id, products, chunk_size=1000):
+        """
+        Create a shop list from an iterable of (name, strikeout) tuples
+        Products are written chunk_size at a time with a multi-row INSERT, or
+        with COPY on PostgreSQL, so memory use does not grow with the number
+        of products. The list and all its products are committed together
+        Returns a (shop_list, product_count) tuple, (None, 0) on error
+        Raises ImportFormatError for an invalid row, nothing is kept then
+        """
+        try:
+            shop_list = ShopList(name=name, owner_id=owner_id)
+            db.session.add(shop_list)
+            db.session.flush()
+
+            rows = ProductService._import_rows(
+                shop_list.id, shop_list.version, products
+            )
+            count = 0
+            open_count = 0
+            while chunk := list(islice(rows, chunk_size)):
+                ProductService._write_chunk(chunk)
+                count += len(chunk)
+                open_count += sum(1 for row in chunk if not row[2])
+
+            ShopListService.adjust_product_counts(shop_list.id, count, open_count)
+            db.session.commit()
+            return shop_list, count
+        except ImportFormatError:
+            db.session.rollback()
+            raise
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error importing shop list: {e}")
+            return None, 0
+
+    @staticmethod
+    def _import_rows(shop_list_id, version, products):
+        """
+        Build product rows in IMPORT_COLUMNS order, ranked in input order
+        """
+        now = datetime.utcnow()
+        rank = None
+        for name, strikeout in products:
+            rank = rank_between(rank, None)
+            yield (
+                str(uuid.uuid4()),
+                name,
+                strikeout,
+                shop_list_id,
+                rank,
+                version,
+                now,
+                now,
+            )
+
+    @staticmethod
+    def _write_chunk(rows):
+        """
+        Insert one chunk of imported product rows, without committing
+        Each chunk is its own COPY so no statement waits on a slow upload
+        """
+        if supports_copy():
+            copy_rows(Product.__table__, ProductService.IMPORT_COLUMNS, rows)
+            return
+
+        db.session.execute(
+            insert(Product),
+            [dict(zip(ProductService.IMPORT_COLUMNS, row)) for row in rows],
+        )
+
+    @staticmethod
+    def iter_product_documents(shop_list_id, batch_size=1000):
+        """
+        Stream the serialized products of a shop list in display order
+        through a server-side cursor, without holding them in memory
+        """
+        rows = db.session.execute(
+            select(Product.id, Product.name, Product.strikeout)
+            .where(Product.shop_list_id == shop_list_id)
+            .order_by(Product.rank, Product.id)
+            .execution_options(yield_per=batch_size)
+        )
+        for product_id, name, strikeout in rows:
+            yield {"id": product_id, "name": name, "strikeout": strikeout}
+
+    @staticmethod
+    def move_product(shop_list_id, product_id, after_id, user_id=None):
+        """
+        Move a product right after another product of the same shop list, or
+        to the start of the list when after_id is None
+        Only the moved product is written: it gets a rank between its new
+        neighbours. When that rank grows longer than RANK_MAX_LENGTH a job
+        is queued to rebalance the list, unless one is already pending. A
+        rank that would not fit the column rebalances the list right away
+        When user_id is given, only move if this user has Write access
+        Returns the moved product if successful, None otherwise
+        """
         try:
-            product.strikeout = not product.strikeout
-            product.updated_at = datetime.utcnow()
+            version = ShopListService.bump_version(shop_list_id, user_id)
+            if version is None:
+                db.session.rollback()
+                return None
+
+            rank = ProductService._rank_after(shop_list_id, product_id, after_id)
+            if rank is not None and len(rank) > Product.rank.type.length:
+                ProductService._spread_ranks(shop_list_id, version)
+                rank = ProductService._rank_after(shop_list_id, product_id, after_id)
+
+            product = None
+            if rank is not None:
+                product = ProductService._update_product(
+                    product_id, {"rank": rank}, version, shop_list_id=shop_list_id
+                )
+            if product is None:
+                db.session.rollback()
+                return None
+
+            max_length = current_app.config.get("RANK_MAX_LENGTH", 24)
+            if len(rank) > max_length and not JobService.has_pending(
+                ProductService.REBALANCE_JOB, shopListId=shop_list_id
+            ):
+                JobService.enqueue(
+                    ProductService.REBALANCE_JOB, {"shopListId": shop_list_id}
+                )
+            document_cache.invalidate(shop_list_id)
+            event_bus.publish(
+                shop_list_id,
+                "product.moved",
+                version,
+                productId=product_id,
+                after=after_id,
+            )
             db.session.commit()
             return product
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error moving product: {e}")
+            return None
+
+    @staticmethod
+    def _rank_after(shop_list_id, product_id, after_id):
+        """
+        Get a rank that places a product right after another one, or first
+        when after_id is None
+        Returns None if after_id is not a product of the shop list
+        """
+        before = None
+        if after_id is not None:
+            before = db.session.execute(
+                select(Product.rank).where(
+                    Product.id == after_id, Product.shop_list_id == shop_list_id
+                )
+            ).scalar_one_or_none()
+            if before is None:
+                return None
+
+        next_rank = select(func.min(Product.rank)).where(
+            Product.shop_list_id == shop_list_id, Product.id != product_id
+        )
+        if before is not None:
+            next_rank = next_rank.where(Product.rank > before)
+
+        return rank_between(before, db.session.execute(next_rank).scalar())
+
+    @staticmethod
+    def _has_long_ranks(shop_list_id, max_length):
+        """
+        Whether a product of a shop list has a rank longer than max_length
+        """
+        stmt = select(Product.id).where(
+            Product.shop_list_id == shop_list_id,
+            func.length(Product.rank) > max_length,
+        )
+        return db.session.execute(stmt.limit(1)).first() is not None
+
+    @staticmethod
+    def _spread_ranks(shop_list_id, version):
+        """
+        Give the products of a shop list evenly spaced ranks in their current
+        order, stamped with the given list version, without committing
+        Returns the number of products
+        """
+        product_ids = (
+            db.session.execute(
+                select(Product.id)
+                .where(Product.shop_list_id == shop_list_id)
+                .order_by(Product.rank, Product.id)
+            )
+            .scalars()
+            .all()
+        )
+        now = datetime.utcnow()
+        db.session.execute(
+            update(Product),
+            [
+                {"id": product_id, "rank": rank, "version": version, "updated_at": now}
+                for product_id, rank in zip(product_ids, spread_ranks(len(product_ids)))
+            ],
+        )
+        return len(product_ids)
+
+    @staticmethod
+    def rebalance_ranks(shop_list_id, max_length=None):
+        """
+        Give the products of a shop list evenly spaced ranks, keeping their
+        order, once any rank is longer than max_length (RANK_MAX_LENGTH)
+        Returns the number of products ranked again, None on error
+        """
+        if max_length is None:
+            max_length = current_app.config.get("RANK_MAX_LENGTH", 24)
+
+        try:
+            if not ProductService._has_long_ranks(shop_list_id, max_length):
+                db.session.rollback()
+                return 0
+
+            version = ShopListService.bump_version(shop_list_id)
+            if version is None:
+                db.session.rollback()
+                return 0
+
+            count = ProductService._spread_ranks(shop_list_id, version)
+            document_cache.invalidate(shop_list_id)
+            event_bus.publish(shop_list_id, "products.changed", version)
+            db.session.commit()
+            return count
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error rebalancing shop list {shop_list_id}: {e}")
+            return None
+
+    @staticmethod
+    def toggle_product_strikeout(product_id, user_id=None):
+        """
+        Toggle the strikeout status of a product, a missing one counts as False
+        The flip happens inside the UPDATE, so concurrent toggles are never
+        lost, and the new value tells how the list's open count changed
+        Returns the updated product if successful, None otherwise
+        """
+        try:
+            product = ProductService._write_product(
+                product_id,
+                {"strikeout": not_(func.coalesce(Product.strikeout, False))},
+                user_id,
+            )
+            open_delta = 0
+            if product is not None:
+                open_delta = -1 if product.strikeout else 1
+            return ProductService._finish_update(product, open_delta)
         except Exception as e:
             db.session.rollback()
             print(f"Error toggling product strikeout: {e}")
             return None
+
+
+def _run_rebalance_job(payload):
+    rebalanced = ProductService.rebalance_ranks(payload["shopListId"])
+    if rebalanced is None:
+        raise RuntimeError(f"Failed to rebalance shop list {payload['shopListId']}")
+    return rebalanced
+
+
+JobService.register(ProductService.REBALANCE_JOB, _run_rebalance_job)
@@ -0,0 +1,212 @@
+import re
+import time
+from collections import Counter
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|\$\d+)"
+_PLACEHOLDER_LIST = re.compile(rf"{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised in testing when a request runs more statements than QUERY_BUDGET
+    """
+
+    def __init__(self, endpoint, count, budget):
+        super().__init__(
+            f"{endpoint} ran {count} SQL statements, the budget is {budget}"
+        )
+        self.endpoint = endpoint
+        self.count = count
+        self.budget = budget
+
+
+def fingerprint(statement):
+    """
+    Normalize a statement so the same query with different parameters or
+    IN list lengths maps to the same string
+    """
+    statement = _PLACEHOLDER_LIST.sub("?", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+class RequestQueryStats:
+    """
+    SQL statements run while serving one request
+    Statements are only fingerprinted when track_statements is set, as N+1
+    detection is the only use of them
+    """
+
+    def __init__(self, track_statements=False):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.track_statements = track_statements
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        if self.track_statements:
+            self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold):
+        """
+        Get the SELECT fingerprints run at least threshold times, the usual
+        shape of an N+1 (a lazy load per row)
+        """
+        return [
+            (statement, count)
+            for statement, count in self.fingerprints.most_common()
+            if count >= threshold and statement.upper().startswith("SELECT")
+        ]
+
+
+class QueryMonitor:
+    """
+    Counts the SQL statements and database time of every request
+    In debug mode it also warns about repeated statements (N+1 patterns) and
+    logs slow queries with their query plan. In testing, a request that runs
+    more than QUERY_BUDGET statements fails with QueryBudgetExceeded
+    """
+
+    def __init__(self, app=None):
+        self.debug = False
+        self.slow_query_ms = 200
+        self.n_plus_one_threshold = 5
+        self._engine_hooks_installed = False
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.debug = app.config.get("QUERY_DEBUG", False)
+        self.slow_query_ms = app.config.get("SLOW_QUERY_MS", self.slow_query_ms)
+        self.n_plus_one_threshold = app.config.get(
+            "N_PLUS_ONE_THRESHOLD", self.n_plus_one_threshold
+        )
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        self._install_engine_hooks()
+        app.extensions["query_monitor"] = self
+
+    @staticmethod
+    def current_stats():
+        """
+        Get the statistics of the current request, None outside of requests
+        """
+        if not has_request_context():
+            return None
+
+        return g.get("query_stats")
+
+    def _install_engine_hooks(self):
+        if self._engine_hooks_installed:
+            return
+
+        event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(Engine, "handle_error", self._handle_error)
+        self._engine_hooks_installed = True
+
+    def _before_request(self):
+        g.query_stats = RequestQueryStats(
+            track_statements=self.debug
+            or current_app.config.get("QUERY_BUDGET") is not None
+        )
+
+    def _after_request(self, response):
+        stats = g.get("query_stats")
+        if stats is None:
+            return response
+
+        endpoint = request.endpoint or request.path
+
+        if self.debug:
+            response.headers["X-Query-Count"] = str(stats.count)
+            response.headers["Server-Timing"] = f"db;dur={stats.duration * 1000:.2f}"
+
+            for statement, count in stats.repeated(self.n_plus_one_threshold):
+                current_app.logger.warning(
+                    "Possible N+1 in %s: statement ran %d times: %s",
+                    endpoint,
+                    count,
+                    statement,
+                )
+
+        budget = current_app.config.get("QUERY_BUDGET")
+        if budget is not None and stats.count > budget:
+            if current_app.testing:
+                raise QueryBudgetExceeded(endpoint, stats.count, budget)
+            current_app.logger.warning(
+                "%s ran %d SQL statements, the budget is %d, repeated: %s",
+                endpoint,
+                stats.count,
+                budget,
+                stats.repeated(self.n_plus_one_threshold),
+            )
+
+        return response
+
+    def _before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    def _after_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        start_times = conn.info.get("query_start_time")
+        if not start_times:
+            return
+
+        duration = time.perf_counter() - start_times.pop()
+        if conn.info.get("explaining"):
+            return
+
+        stats = self.current_stats()
+        if stats is not None:
+            stats.record(statement, duration)
+
+        if self.debug and duration * 1000 >= self.slow_query_ms:
+            self._log_slow_query(conn, statement, parameters, executemany, duration)
+
+    def _handle_error(self, context):
+        if context.connection is None:
+            return
+
+        start_times = context.connection.info.get("query_start_time")
+        if start_times:
+            start_times.pop()
+
+    def _log_slow_query(self, conn, statement, parameters, executemany, duration):
+        plan = None
+        if not executemany and statement.lstrip().upper().startswith("SELECT"):
+            explain = (
+                "EXPLAIN QUERY PLAN" if conn.dialect.name == "sqlite" else "EXPLAIN"
+            )
+            conn.info["explaining"] = True
+            try:
+                rows = conn.exec_driver_sql(f"{explain} {statement}", parameters)
+                plan = "\n".join(" ".join(str(col) for col in row) for row in rows)
+            except Exception as e:
+                plan = f"EXPLAIN failed: {e}"
+            finally:
+                conn.info["explaining"] = False
+
+        message = "Slow query (%.1fms): %s"
+        args = [duration * 1000, _WHITESPACE.sub(" ", statement)]
+        if plan:
+            message += "\n%s"
+            args.append(plan)
+
+        if has_app_context():
+            current_app.logger.warning(message, *args)
+        else:
+            print(message % tuple(args))
+
+
+query_monitor = QueryMonitor()
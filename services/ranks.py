@@ -0,0 +1,120 @@
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+
+# Ranks are strings of base 36 digits that sort in display order, compared
+# byte by byte (collation "C" on PostgreSQL). An item is moved by giving it a
+# rank between its new neighbours, so no other row changes. Ranks never end
+# in "0", which guarantees there is always room between two of them
+#
+# Appends and rebalanced lists use ranks of at least this many digits, enough
+# for about two billion appends before a rank gets longer
+WIDTH = 6
+
+
+def rank_between(before, after):
+    """
+    Get a rank that sorts strictly between two ranks
+    before is None for the start of the list, after is None for its end
+    Raises ValueError unless before sorts before after
+    """
+    if before is not None and after is not None and before >= after:
+        raise ValueError(f"Rank {before!r} does not sort before {after!r}")
+
+    if after is None:
+        return _increment(before) if before else DIGITS[BASE // 2]
+
+    if before is None:
+        return _decrement(after) or _midpoint("", after)
+
+    return _midpoint(before, after)
+
+
+def ranks_after(before, count):
+    """
+    Get count increasing ranks that all sort after before (None for an empty
+    list), for appending items in order
+    """
+    ranks = []
+    for _ in range(count):
+        before = rank_between(before, None)
+        ranks.append(before)
+    return ranks
+
+
+def spread_ranks(count):
+    """
+    Get count evenly spaced, increasing ranks, used to rebalance a list
+    """
+    width = WIDTH
+    while BASE**width < (count + 1) * BASE:
+        width += 1
+
+    step = BASE**width // (count + 1)
+    return [_format(step * (index + 1), width) for index in range(count)]
+
+
+def _parse(rank):
+    value = 0
+    for digit in rank:
+        value = value * BASE + DIGITS.index(digit)
+    return value
+
+
+def _format(value, width):
+    """
+    Write value with width digits, dropping trailing zeros
+    """
+    digits = []
+    for _ in range(width):
+        value, digit = divmod(value, BASE)
+        digits.append(DIGITS[digit])
+    return "".join(reversed(digits)).rstrip("0")
+
+
+def _increment(rank):
+    width = max(len(rank), WIDTH)
+    value = _parse(rank.ljust(width, "0")) + 1
+    if value >= BASE**width:
+        return rank + DIGITS[BASE // 2]
+    return _format(value, width)
+
+
+def _decrement(rank):
+    """
+    Returns None when there is no rank of the same width below this one
+    """
+    width = max(len(rank), WIDTH)
+    value = _parse(rank.ljust(width, "0")) - 1
+    if value <= 0:
+        return None
+    return _format(value, width)
+
+
+def _midpoint(before, after):
+    """
+    Midpoint of two ranks, before may be "" for the start and after None for
+    the end of the list
+    """
+    if after is not None:
+        # Keep the common prefix, a missing digit of before counts as "0"
+        prefix = 0
+        while (
+            prefix < len(after)
+            and (before[prefix] if prefix < len(before) else "0") == after[prefix]
+        ):
+            prefix += 1
+        if prefix:
+            return after[:prefix] + _midpoint(before[prefix:], after[prefix:])
+
+    digit_before = DIGITS.index(before[0]) if before else 0
+    digit_after = DIGITS.index(after[0]) if after else BASE
+
+    if digit_after - digit_before > 1:
+        return DIGITS[(digit_before + digit_after + 1) // 2]
+
+    # Adjacent first digits: after[0] alone fits if after has more digits,
+    # otherwise keep before's first digit and split the remaining range
+    if after is not None and len(after) > 1:
+        return after[0]
+
+    return DIGITS[digit_before] + _midpoint(before[1:], None)
@@ -0,0 +1,140 @@
+import itertools
+import threading
+import time
+from flask import has_request_context, session as flask_session
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from models import db
+
+
+class ReplicaRouter:
+    """
+    Picks the read replica for read-only requests
+    Replicas are used round-robin, one per database session so a request sees
+    a single snapshot. A replica that fails with a connection error is skipped
+    for REPLICA_RETRY_SECONDS. After a user writes, their reads stay on the
+    primary for REPLICA_STICKY_SECONDS so they never read their own changes
+    from a replica that has not caught up yet
+    """
+
+    BIND_PREFIX = "replica_"
+
+    def __init__(self, app=None):
+        self.bind_keys = []
+        self.sticky_seconds = 5
+        self.retry_seconds = 30
+        self._down_until = {}
+        self._cycle = itertools.cycle(())
+        self._lock = threading.Lock()
+        self._hooks_installed = False
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Register the replicas as SQLALCHEMY_BINDS, must run before db.init_app
+        """
+        urls = app.config.get("DATABASE_REPLICA_URLS") or []
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        self.bind_keys = []
+        for index, url in enumerate(urls):
+            bind_key = f"{self.BIND_PREFIX}{index}"
+            binds[bind_key] = url
+            self.bind_keys.append(bind_key)
+
+        app.config["SQLALCHEMY_BINDS"] = binds
+        self.sticky_seconds = app.config.get("REPLICA_STICKY_SECONDS", 5)
+        self.retry_seconds = app.config.get("REPLICA_RETRY_SECONDS", 30)
+        self._down_until = {}
+        self._cycle = itertools.cycle(self.bind_keys)
+
+        self._install_hooks()
+        app.extensions["replica_router"] = self
+
+    def reads_from_primary(self):
+        """
+        Whether the current user wrote recently enough to need the primary
+        """
+        return flask_session.get("primary_until", 0) > time.time()
+
+    def engine_for(self, session):
+        """
+        Get the replica engine a session reads from, None to use the primary
+        """
+        if not self.bind_keys:
+            return None
+
+        bind_key = session.info.get("replica")
+        if bind_key is None or not self._is_up(bind_key):
+            bind_key = self._next_healthy()
+            if bind_key is None:
+                return None
+            session.info["replica"] = bind_key
+
+        return db.engines[bind_key]
+
+    def mark_down(self, bind_key):
+        with self._lock:
+            self._down_until[bind_key] = time.monotonic() + self.retry_seconds
+        print(f"Read replica {bind_key} is unavailable, using the others")
+
+    def _is_up(self, bind_key):
+        return self._down_until.get(bind_key, 0) <= time.monotonic()
+
+    def _next_healthy(self):
+        for _ in range(len(self.bind_keys)):
+            with self._lock:
+                bind_key = next(self._cycle)
+                if not self._is_up(bind_key):
+                    continue
+                recovering = self._down_until.pop(bind_key, None) is not None
+
+            if not recovering or self._probe(bind_key):
+                return bind_key
+        return None
+
+    def _probe(self, bind_key):
+        """
+        Check that a replica marked down is reachable again before using it
+        """
+        try:
+            with db.engines[bind_key].connect() as connection:
+                connection.exec_driver_sql("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def _install_hooks(self):
+        if self._hooks_installed:
+            return
+
+        event.listen(db.session, "do_orm_execute", self._on_execute)
+        event.listen(db.session, "after_flush", self._on_flush)
+        event.listen(db.session, "after_commit", self._after_commit)
+        event.listen(Engine, "handle_error", self._on_error)
+        self._hooks_installed = True
+
+    def _on_execute(self, orm_execute_state):
+        if not orm_execute_state.is_select:
+            orm_execute_state.session.info["wrote"] = True
+
+    def _on_flush(self, session, flush_context):
+        session.info["wrote"] = True
+
+    def _after_commit(self, session):
+        if self.bind_keys and session.info.get("wrote") and has_request_context():
+            flask_session["primary_until"] = time.time() + self.sticky_seconds
+
+    def _on_error(self, context):
+        # No connection means the replica could not be reached at all
+        failed = context.is_disconnect or context.connection is None
+        if not failed or not self.bind_keys:
+            return
+
+        for bind_key in self.bind_keys:
+            if db.engines.get(bind_key) is context.engine:
+                self.mark_down(bind_key)
+
+
+replica_router = ReplicaRouter()
@@ -1,16 +1,42 @@
+import hashlib
+import uuid
+from flask import current_app, g, has_app_context
+from sqlalchemy import (
+    and_,
+    case,
+    delete,
+    exists,
+    func,
+    insert,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from models import db
-from models.shop_list import ShopList, Product, ShopListShare, Access
+from models.shop_list import ShopList, Product, ShopListShare, Tombstone, Access
+from models.user import User
 from services.user_service import UserService
-from datetime import datetime
+from services.sql_helpers import supports_returning, upsert_insert
+from services.events import event_bus
+from services.document_cache import document_cache
+from services.job_service import JobService
+from services.pagination import paginate
+from datetime import datetime, timedelta
 
 
 class ShopListService:
+    SHARE_JOB = "shop_list.share"
+    PURGE_JOB = "shop_list.purge"
+    COMPACT_TOMBSTONES_JOB = "tombstones.compact"
+
     @staticmethod
     def create_shop_list(name, owner_id):
         """
         Create a new shopping list for the specified owner
         """
-        owner = UserService.get_user_by_id(owner_id)
+        owner = UserService.get_user_identity(owner_id)
         if not owner:
             return None
 
@@ -24,138 +50,862 @@ class ShopListService:
     @staticmethod
     def get_shop_list_by_id(shop_list_id):
         """
-        Retrieve a shop list by its ID
+        Retrieve a shop list by its ID, soft-deleted lists are not returned
+        Reuses a list already resolved earlier in the same request
+        """
+        for (cached_id, _), (shop_list, _) in ShopListService._access_cache().items():
+            if cached_id == shop_list_id and shop_list is not None:
+                return shop_list
+
+        shop_list = ShopList.query.get(shop_list_id)
+        if shop_list is None or shop_list.deleted_at is not None:
+            return None
+
+        return shop_list
+
+    @staticmethod
+    def _access_cache():
+        """
+        Per-request cache of resolved (shop_list, access) pairs, kept on flask.g
+        Outside of an application context an empty, throwaway dict is returned
+        """
+        if not has_app_context():
+            return {}
+
+        if "shop_list_access" not in g:
+            g.shop_list_access = {}
+
+        return g.shop_list_access
+
+    @staticmethod
+    def _forget_access(shop_list_id):
+        """
+        Drop every cached access resolution for a shop list
+        """
+        cache = ShopListService._access_cache()
+        for key in [key for key in cache if key[0] == shop_list_id]:
+            del cache[key]
+
+    @staticmethod
+    def resolve_access(shop_list_id, user_id):
+        """
+        Load a shop list together with the user's access level in a single query
+        The result is cached for the rest of the request
+        Returns a (shop_list, access) tuple, shop_list is None if the list does
+        not exist and access is None if the user has no access to it
+        """
+        cache = ShopListService._access_cache()
+        key = (shop_list_id, user_id)
+        if key in cache:
+            return cache[key]
+
+        row = (
+            db.session.query(ShopList, ShopListShare.access)
+            .outerjoin(
+                ShopListShare,
+                and_(
+                    ShopListShare.shop_list_id == ShopList.id,
+                    ShopListShare.user_id == user_id,
+                ),
+            )
+            .filter(ShopList.id == shop_list_id, ShopList.deleted_at.is_(None))
+            .first()
+        )
+
+        if row is None:
+            result = (None, None)
+        else:
+            shop_list, share_access = row
+            if shop_list.owner_id == user_id:
+                result = (shop_list, Access.Write)
+            elif share_access is not None:
+                result = (shop_list, Access(share_access))
+            else:
+                result = (shop_list, None)
+
+        cache[key] = result
+        return result
+
+    @staticmethod
+    def bump_version(shop_list_id, user_id=None, products=0, open_products=0):
+        """
+        Increment the version of a shop list, without committing
+        Every change to a list, its products or its shares goes through this:
+        the row lock it takes orders concurrent writers, so the version stamped
+        on changed rows works as a monotonic sync cursor and as an ETag
+        shop_list_id may also be a scalar subquery that yields the list ID
+        When user_id is given, the list is only bumped if the user may write to it
+        products and open_products are added to the list's product counters
+        in the same UPDATE
+        Returns the new version, or None if no list was bumped
+        """
+        values = {"version": ShopList.version + 1}
+        if products:
+            values["product_count"] = ShopList.product_count + products
+        if open_products:
+            values["open_count"] = ShopList.open_count + open_products
+
+        stmt = (
+            update(ShopList)
+            .where(ShopList.id == shop_list_id, ShopList.deleted_at.is_(None))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if user_id is not None:
+            stmt = stmt.where(ShopListService.write_access_clause(user_id))
+
+        if supports_returning("update"):
+            version = db.session.execute(
+                stmt.returning(ShopList.version)
+            ).scalar_one_or_none()
+        else:
+            version = None
+            if db.session.execute(stmt).rowcount:
+                version = db.session.execute(
+                    select(ShopList.version).where(ShopList.id == shop_list_id)
+                ).scalar_one()
+
+        if version is not None and isinstance(shop_list_id, str):
+            shop_list = db.session.identity_map.get(
+                db.session.identity_key(ShopList, shop_list_id)
+            )
+            if shop_list is not None:
+                set_committed_value(shop_list, "version", version)
+
+        return version
+
+    @staticmethod
+    def adjust_product_counts(shop_list_id, products=0, open_products=0):
+        """
+        Add to the product counters of a shop list, without committing
+        The increments happen inside the UPDATE, so concurrent changes are
+        never lost
         """
-        return ShopList.query.get(shop_list_id)
+        if not products and not open_products:
+            return
+
+        db.session.execute(
+            update(ShopList)
+            .where(ShopList.id == shop_list_id)
+            .values(
+                product_count=ShopList.product_count + products,
+                open_count=ShopList.open_count + open_products,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def recount_products(batch_size=1000):
+        """
+        Recompute the product counters of every shop list from the products
+        table, committing after each batch of lists
+        Lists whose counters drifted also get a new version, so clients
+        reload them
+        Returns the number of lists that were corrected
+        """
+        product_count = (
+            select(func.count(Product.id))
+            .where(Product.shop_list_id == ShopList.id)
+            .scalar_subquery()
+        )
+        open_count = (
+            select(func.count(Product.id))
+            .where(Product.shop_list_id == ShopList.id, Product.strikeout.is_not(True))
+            .scalar_subquery()
+        )
+
+        corrected = 0
+        last_id = None
+        while True:
+            query = select(ShopList.id).order_by(ShopList.id).limit(batch_size)
+            if last_id is not None:
+                query = query.where(ShopList.id > last_id)
+            shop_list_ids = db.session.execute(query).scalars().all()
+            if not shop_list_ids:
+                return corrected
+
+            try:
+                result = db.session.execute(
+                    update(ShopList)
+                    .where(
+                        ShopList.id.in_(shop_list_ids),
+                        or_(
+                            ShopList.product_count != product_count,
+                            ShopList.open_count != open_count,
+                        ),
+                    )
+                    .values(
+                        product_count=product_count,
+                        open_count=open_count,
+                        version=ShopList.version + 1,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                db.session.commit()
+                corrected += result.rowcount
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error recounting products: {e}")
+
+            last_id = shop_list_ids[-1]
+
+    @staticmethod
+    def get_shop_list_summaries(user_id):
+        """
+        Get the name and product counters of every shop list a user has
+        access to, in document order, without reading any products
+        Returns the summaries and a version token for use as an ETag
+        """
+        accessible = ShopListService._accessible_ids_subquery(user_id)
+        rows = db.session.execute(
+            select(
+                ShopList.id,
+                ShopList.name,
+                ShopList.product_count,
+                ShopList.open_count,
+                ShopList.version,
+            )
+            .join(accessible, accessible.c.id == ShopList.id)
+            .order_by(*ShopListService._document_order(user_id))
+        ).all()
+
+        digest = hashlib.sha1()
+        summaries = []
+        for shop_list_id, name, product_count, open_count, version in rows:
+            digest.update(f"{shop_list_id}:{version};".encode())
+            summaries.append(
+                {
+                    "id": shop_list_id,
+                    "name": name,
+                    "productCount": product_count,
+                    "openCount": open_count,
+                }
+            )
+        return summaries, digest.hexdigest()
+
+    @staticmethod
+    def get_collection_version(user_id):
+        """
+        Get a token that changes whenever any shop list the user has access to
+        changes, or when a list is added to or removed from that set
+        Only list IDs and versions are read, products are not loaded
+        """
+        rows = (
+            ShopListService._accessible_shop_lists_query(user_id)
+            .with_entities(ShopList.id, ShopList.version)
+            .all()
+        )
+        digest = hashlib.sha1()
+        for shop_list_id, version in rows:
+            digest.update(f"{shop_list_id}:{version};".encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _accessible_shop_lists_union(user_id):
+        """
+        Build a single, unordered query over all shop lists a user has access to
+        """
+        owned_lists = ShopList.query.filter(
+            ShopList.owner_id == user_id, ShopList.deleted_at.is_(None)
+        )
+
+        shared_lists = ShopList.query.join(
+            ShopListShare, ShopListShare.shop_list_id == ShopList.id
+        ).filter(
+            ShopListShare.user_id == user_id,
+            ShopList.owner_id != user_id,
+            ShopList.deleted_at.is_(None),
+        )
+
+        return owned_lists.union_all(shared_lists)
+
+    @staticmethod
+    def _accessible_shop_lists_query(user_id):
+        """
+        Build a single query over all shop lists a user has access to
+        Owned lists come first, followed by lists shared with the user
+        """
+        return ShopListService._accessible_shop_lists_union(user_id).order_by(
+            case((ShopList.owner_id == user_id, 0), else_=1), ShopList.created_at
+        )
 
     @staticmethod
     def get_shop_lists_for_user(user_id):
         """
         Get all shop lists a user has access to (owned or shared)
         """
-        owned_lists = ShopList.query.filter_by(owner_id=user_id).all()
+        return ShopListService._accessible_shop_lists_query(user_id).all()
 
-        shared_lists_ids = (
-            db.session.query(ShopListShare.shop_list_id)
-            .filter_by(user_id=user_id)
-            .all()
+    @staticmethod
+    def _accessible_ids_subquery(user_id):
+        """
+        Core UNION ALL of the IDs of all shop lists a user has access to
+        """
+        owned_ids = select(ShopList.id.label("id")).where(
+            ShopList.owner_id == user_id, ShopList.deleted_at.is_(None)
+        )
+        shared_ids = (
+            select(ShopListShare.shop_list_id.label("id"))
+            .join(ShopList, ShopList.id == ShopListShare.shop_list_id)
+            .where(
+                ShopListShare.user_id == user_id,
+                ShopList.owner_id != user_id,
+                ShopList.deleted_at.is_(None),
+            )
         )
-        shared_lists_ids = [id[0] for id in shared_lists_ids]
-        shared_lists = ShopList.query.filter(ShopList.id.in_(shared_lists_ids)).all()
+        return owned_ids.union_all(shared_ids).subquery()
 
-        return owned_lists + shared_lists
+    @staticmethod
+    def _document_order(user_id):
+        """
+        Order of shop list documents: owned lists first, then by creation
+        """
+        return (
+            case((ShopList.owner_id == user_id, 0), else_=1),
+            ShopList.created_at,
+            ShopList.id,
+        )
 
     @staticmethod
-    def add_product(shop_list_id, name):
+    def _build_documents(list_rows, share_rows, product_rows=None):
         """
-        Add a product to a shop list
+        Map plain column tuples straight to shop list documents, without
+        building ORM objects. The output matches ShopList.to_dict
+        list_rows: (id, name, owner_id) in document order
+        share_rows: (shop_list_id, username, access) in share order
+        product_rows: (shop_list_id, id, name, strikeout) in product order, or
+        None to leave products out
         """
-        shop_list = ShopListService.get_shop_list_by_id(shop_list_id)
-        if not shop_list:
-            return None
+        documents = {}
+        for list_id, name, owner_id in list_rows:
+            document = {
+                "id": list_id,
+                "name": name,
+                "access": Access.Write,
+                "ownerId": owner_id,
+                "sharedWith": [],
+            }
+            if product_rows is not None:
+                document["products"] = []
+            documents[list_id] = document
 
-        product = Product(name=name, shop_list_id=shop_list_id)
-        db.session.add(product)
-        db.session.commit()
+        for list_id, username, access in share_rows:
+            documents[list_id]["sharedWith"].append(
+                {"username": username, "access": Access(access)}
+            )
 
-        return product
+        for list_id, product_id, name, strikeout in product_rows or ():
+            documents[list_id]["products"].append(
+                {"id": product_id, "name": name, "strikeout": strikeout}
+            )
+
+        return list(documents.values())
 
     @staticmethod
-    def check_user_access(shop_list_id, user_id, min_level=Access.Read):
+    def get_shop_list_documents_for_user(user_id, include_products=True):
         """
-        Check what access level a user has to a shop list
-        Returns Access enum or None if no access
+        Get the serialized form of all shop lists a user has access to
+        Reads plain columns in three queries (lists, shares, products),
+        however many lists there are
         """
-        shop_list = ShopListService.get_shop_list_by_id(shop_list_id)
+        accessible = ShopListService._accessible_ids_subquery(user_id)
 
-        if not shop_list:
-            return None
+        list_rows = db.session.execute(
+            select(ShopList.id, ShopList.name, ShopList.owner_id)
+            .join(accessible, accessible.c.id == ShopList.id)
+            .order_by(*ShopListService._document_order(user_id))
+        ).all()
+        share_rows = db.session.execute(
+            select(ShopListShare.shop_list_id, User.username, ShopListShare.access)
+            .join(accessible, accessible.c.id == ShopListShare.shop_list_id)
+            .join(User, User.id == ShopListShare.user_id)
+            .order_by(ShopListShare.created_at, ShopListShare.id)
+        ).all()
 
-        if shop_list.owner_id == user_id:
-            return Access.Write
+        product_rows = None
+        if include_products:
+            product_rows = db.session.execute(
+                select(
+                    Product.shop_list_id, Product.id, Product.name, Product.strikeout
+                )
+                .join(accessible, accessible.c.id == Product.shop_list_id)
+                .order_by(Product.rank, Product.id)
+            ).all()
+
+        return ShopListService._build_documents(list_rows, share_rows, product_rows)
+
+    @staticmethod
+    def get_shop_list_document(shop_list):
+        """
+        Get the serialized form of one shop list from plain column reads
+        """
+        share_rows = db.session.execute(
+            select(ShopListShare.shop_list_id, User.username, ShopListShare.access)
+            .join(User, User.id == ShopListShare.user_id)
+            .where(ShopListShare.shop_list_id == shop_list.id)
+            .order_by(ShopListShare.created_at, ShopListShare.id)
+        ).all()
+        product_rows = db.session.execute(
+            select(Product.shop_list_id, Product.id, Product.name, Product.strikeout)
+            .where(Product.shop_list_id == shop_list.id)
+            .order_by(Product.rank, Product.id)
+        ).all()
+
+        list_rows = [(shop_list.id, shop_list.name, shop_list.owner_id)]
+        return ShopListService._build_documents(list_rows, share_rows, product_rows)[0]
+
+    @staticmethod
+    def iter_shop_list_documents_for_user(user_id, batch_size=1000):
+        """
+        Stream all shop lists a user has access to, in the same order as
+        get_shop_list_documents_for_user, without holding them in memory
+        Products and shares are read through two ordered, server-side cursor
+        queries that are merged list by list. Yields ("list", header, shares)
+        for each list followed by one ("product", product) per product
+        """
+        accessible = ShopListService._accessible_ids_subquery(user_id)
+        list_order = ShopListService._document_order(user_id)
+
+        product_rows = db.session.execute(
+            select(
+                ShopList.id,
+                ShopList.name,
+                ShopList.owner_id,
+                Product.id,
+                Product.name,
+                Product.strikeout,
+            )
+            .join(accessible, accessible.c.id == ShopList.id)
+            .outerjoin(Product, Product.shop_list_id == ShopList.id)
+            .order_by(*list_order, Product.rank, Product.id)
+            .execution_options(yield_per=batch_size)
+        )
+        share_rows = db.session.execute(
+            select(ShopListShare.shop_list_id, User.username, ShopListShare.access)
+            .join(ShopList, ShopList.id == ShopListShare.shop_list_id)
+            .join(accessible, accessible.c.id == ShopList.id)
+            .join(User, User.id == ShopListShare.user_id)
+            .order_by(*list_order, ShopListShare.created_at, ShopListShare.id)
+            .execution_options(yield_per=batch_size)
+        )
+
+        next_share = next(share_rows, None)
+        current_list_id = None
 
-        share = ShopListShare.query.filter_by(
-            shop_list_id=shop_list_id, user_id=user_id
-        ).first()
+        for (
+            list_id,
+            name,
+            owner_id,
+            product_id,
+            product_name,
+            strikeout,
+        ) in product_rows:
+            if list_id != current_list_id:
+                current_list_id = list_id
 
-        if share:
-            access = Access(share.access)
-            if access >= min_level:
-                return access
+                shares = []
+                while next_share is not None and next_share[0] == list_id:
+                    shares.append(
+                        {"username": next_share[1], "access": Access(next_share[2])}
+                    )
+                    next_share = next(share_rows, None)
+
+                header = {
+                    "id": list_id,
+                    "name": name,
+                    "access": Access.Write,
+                    "ownerId": owner_id,
+                }
+                yield "list", header, shares
+
+            if product_id is not None:
+                yield (
+                    "product",
+                    {
+                        "id": product_id,
+                        "name": product_name,
+                        "strikeout": strikeout,
+                    },
+                )
+
+    @staticmethod
+    def get_shop_list_documents_page(
+        user_id, limit, cursor=None, include_products=True
+    ):
+        """
+        Get one keyset page of the serialized shop lists a user has access to,
+        ordered by (created_at, id)
+        Returns the documents and the cursor of the next page (None at the end)
+        """
+        query = ShopListService._accessible_shop_lists_union(user_id).options(
+            selectinload(ShopList.shared_with).joinedload(ShopListShare.user)
+        )
+        if include_products:
+            query = query.options(selectinload(ShopList.products))
+
+        shop_lists, next_cursor = paginate(
+            query, ShopList.created_at, ShopList.id, limit, cursor
+        )
+
+        documents = [
+            shop_list.to_dict(include_products=include_products)
+            for shop_list in shop_lists
+        ]
+        return documents, next_cursor
+
+    @staticmethod
+    def last_product_rank(shop_list_id):
+        """
+        Get the rank of the last product in a shop list, None if it is empty
+        Read from the end of the (shop_list_id, rank) index
+        """
+        return db.session.execute(
+            select(func.max(Product.rank)).where(Product.shop_list_id == shop_list_id)
+        ).scalar()
+
+    @staticmethod
+    def check_user_access(shop_list_id, user_id, min_level=Access.Read):
+        """
+        Check what access level a user has to a shop list
+        Returns Access enum or None if no access
+        """
+        _, access = ShopListService.resolve_access(shop_list_id, user_id)
+
+        if access is not None and access >= min_level:
+            return access
 
         return None
 
+    @staticmethod
+    def write_access_clause(user_id):
+        """
+        Build a WHERE clause on shop_lists that holds when the user may write
+        to the list, for use inside set-based UPDATE statements
+        """
+        return or_(
+            ShopList.owner_id == user_id,
+            exists().where(
+                ShopListShare.shop_list_id == ShopList.id,
+                ShopListShare.user_id == user_id,
+                ShopListShare.access >= Access.Write.value,
+            ),
+        )
+
     @staticmethod
     def share_shop_list(shop_list_id, usernames, access):
         """
         Share a shop list with multiple users at once
+        Usernames are resolved with one query and all shares are written with
+        a single upsert
         Returns the list of user IDs that the shop list was shared with
         """
         shop_list = ShopListService.get_shop_list_by_id(shop_list_id)
         if not shop_list:
             return None
 
-        shared_user_ids = []
+        users = UserService.get_users_by_usernames(usernames)
 
+        shared_user_ids = []
         for username in usernames:
-            user = UserService.get_user_by_username(username)
-            if not user:
-                continue
+            user = users.get(username) if isinstance(username, str) else None
+            if user and user.id != shop_list.owner_id:
+                shared_user_ids.append(user.id)
 
-            if user.id == shop_list.owner_id:
-                continue
+        if not shared_user_ids:
+            return shared_user_ids
 
-            existing_share = ShopListShare.query.filter_by(
-                shop_list_id=shop_list_id, user_id=user.id
-            ).first()
+        version = ShopListService.bump_version(shop_list_id)
 
-            if existing_share:
-                existing_share.access = access
-                shared_user_ids.append(user.id)
-            else:
-                share = ShopListShare(
-                    shop_list_id=shop_list_id, user_id=user.id, access=access
-                )
-                db.session.add(share)
-                shared_user_ids.append(user.id)
+        now = datetime.utcnow()
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "shop_list_id": shop_list_id,
+                "user_id": user_id,
+                "access": access,
+                "version": version,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for user_id in dict.fromkeys(shared_user_ids)
+        ]
 
+        stmt = upsert_insert(ShopListShare)
+
+        if stmt is not None:
+            stmt = stmt.values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["shop_list_id", "user_id"],
+                set_={
+                    "access": stmt.excluded.access,
+                    "version": stmt.excluded.version,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            )
+            db.session.execute(stmt, execution_options={"synchronize_session": False})
+        else:
+            existing_shares = ShopListShare.query.filter(
+                ShopListShare.shop_list_id == shop_list_id,
+                ShopListShare.user_id.in_(shared_user_ids),
+            ).all()
+            existing_shares = {share.user_id: share for share in existing_shares}
+
+            for row in rows:
+                existing_share = existing_shares.get(row["user_id"])
+                if existing_share:
+                    existing_share.access = access
+                    existing_share.version = version
+                else:
+                    db.session.add(ShopListShare(**row))
+
+        # A re-shared user is current again, drop the tombstone of the old share
+        db.session.execute(
+            delete(Tombstone)
+            .where(
+                Tombstone.shop_list_id == shop_list_id,
+                Tombstone.kind == Tombstone.SHARE,
+                Tombstone.entity_id.in_(shared_user_ids),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        document_cache.invalidate(shop_list_id)
+        event_bus.publish(
+            shop_list_id,
+            "shares.updated",
+            version,
+            count=len(set(shared_user_ids)),
+        )
         db.session.commit()
+        ShopListService._forget_access(shop_list_id)
 
         return shared_user_ids
 
+    @staticmethod
+    def share_shop_list_later(shop_list_id, usernames, access, owner_id):
+        """
+        Queue a background job that shares a shop list with many users
+        Returns the job, or None if it could not be queued
+        """
+        try:
+            job = JobService.enqueue(
+                ShopListService.SHARE_JOB,
+                {"shopListId": shop_list_id, "usernames": usernames, "access": access},
+                owner_id=owner_id,
+            )
+            db.session.commit()
+            return job
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error queueing share job: {e}")
+            return None
+
     @staticmethod
     def unshare_shop_list(shop_list_id, usernames):
         """
         Remove sharing of a shop list from multiple users at once
+        Usernames are resolved with one query and all shares are removed with
+        a single DELETE
         Returns the list of user IDs that the shop list was unshared from
         """
         shop_list = ShopListService.get_shop_list_by_id(shop_list_id)
         if not shop_list:
             return None
 
-        unshared_user_ids = []
+        users = UserService.get_users_by_usernames(usernames)
+        user_ids = [user.id for user in users.values()]
 
-        for username in usernames:
-            user = UserService.get_user_by_username(username)
-            if not user:
-                continue
+        if not user_ids:
+            return []
 
-            existing_share = ShopListShare.query.filter_by(
-                shop_list_id=shop_list_id, user_id=user.id
-            ).first()
+        version = ShopListService.bump_version(shop_list_id)
 
-            if existing_share:
-                db.session.delete(existing_share)
-                unshared_user_ids.append(user.id)
+        stmt = (
+            delete(ShopListShare)
+            .where(
+                ShopListShare.shop_list_id == shop_list_id,
+                ShopListShare.user_id.in_(user_ids),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        if supports_returning("delete"):
+            removed_user_ids = set(
+                db.session.execute(stmt.returning(ShopListShare.user_id)).scalars()
+            )
+        else:
+            removed_user_ids = set(
+                db.session.execute(
+                    select(ShopListShare.user_id).where(
+                        ShopListShare.shop_list_id == shop_list_id,
+                        ShopListShare.user_id.in_(user_ids),
+                    )
+                ).scalars()
+            )
+            db.session.execute(stmt)
 
+        if not removed_user_ids:
+            db.session.rollback()
+            return []
+
+        ShopListService.record_tombstones(
+            shop_list_id, Tombstone.SHARE, removed_user_ids, version
+        )
+        document_cache.invalidate(shop_list_id)
+        event_bus.publish(
+            shop_list_id, "shares.removed", version, count=len(removed_user_ids)
+        )
         db.session.commit()
+        ShopListService._forget_access(shop_list_id)
+
+        unshared_user_ids = []
+        for username in usernames:
+            user = users.get(username) if isinstance(username, str) else None
+            if user and user.id in removed_user_ids:
+                unshared_user_ids.append(user.id)
+                removed_user_ids.discard(user.id)
 
         return unshared_user_ids
 
+    @staticmethod
+    def record_tombstones(shop_list_id, kind, entity_ids, version):
+        """
+        Record removed products or shares of a shop list, without committing
+        """
+        db.session.execute(
+            insert(Tombstone),
+            [
+                {
+                    "id": str(uuid.uuid4()),
+                    "shop_list_id": shop_list_id,
+                    "kind": kind,
+                    "entity_id": entity_id,
+                    "version": version,
+                }
+                for entity_id in entity_ids
+            ],
+        )
+
+    @staticmethod
+    def get_changes(shop_list, since=None):
+        """
+        Get what changed in a shop list after the given cursor (a list version)
+        Without a cursor the full current state is returned
+        Products carry their rank, so clients can place moved products
+        Returns None if the cursor is older than the compacted tombstones, in
+        which case the client has to reload the whole list
+        """
+        since = since or 0
+        if since and since < shop_list.pruned_version:
+            return None
+
+        products = (
+            Product.query.filter(
+                Product.shop_list_id == shop_list.id, Product.version > since
+            )
+            .order_by(Product.rank, Product.id)
+            .all()
+        )
+        shares = (
+            ShopListShare.query.options(joinedload(ShopListShare.user))
+            .filter(
+                ShopListShare.shop_list_id == shop_list.id,
+                ShopListShare.version > since,
+            )
+            .order_by(ShopListShare.created_at, ShopListShare.id)
+            .all()
+        )
+
+        deleted_products = []
+        deleted_shares = []
+        if since:
+            tombstones = (
+                db.session.query(Tombstone.kind, Tombstone.entity_id, User.username)
+                .outerjoin(User, User.id == Tombstone.entity_id)
+                .filter(
+                    Tombstone.shop_list_id == shop_list.id, Tombstone.version > since
+                )
+                .order_by(Tombstone.version)
+                .all()
+            )
+            for kind, entity_id, username in tombstones:
+                if kind == Tombstone.PRODUCT:
+                    deleted_products.append(entity_id)
+                elif username is not None:
+                    deleted_shares.append(username)
+
+        return {
+            "cursor": str(shop_list.version),
+            "name": shop_list.name,
+            "products": [
+                {**product.to_dict(), "rank": product.rank} for product in products
+            ],
+            "sharedWith": [share.to_dict() for share in shares],
+            "deleted": {"products": deleted_products, "sharedWith": deleted_shares},
+        }
+
+    @staticmethod
+    def compact_tombstones(older_than):
+        """
+        Delete tombstones created before the given time
+        Each affected list remembers the newest pruned version, so clients
+        holding an older cursor are told to reload instead of missing deletions
+        Returns the number of tombstones removed
+        """
+        pruned = (
+            select(func.max(Tombstone.version))
+            .where(
+                Tombstone.shop_list_id == ShopList.id,
+                Tombstone.created_at < older_than,
+            )
+            .scalar_subquery()
+        )
+        affected_ids = select(Tombstone.shop_list_id).where(
+            Tombstone.created_at < older_than
+        )
+
+        try:
+            db.session.execute(
+                update(ShopList)
+                .where(ShopList.id.in_(affected_ids))
+                .values(pruned_version=pruned)
+                .execution_options(synchronize_session=False)
+            )
+            result = db.session.execute(
+                delete(Tombstone)
+                .where(Tombstone.created_at < older_than)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            return result.rowcount
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error compacting tombstones: {e}")
+            return 0
+
+    @staticmethod
+    def compact_tombstones_later(days):
+        """
+        Queue a background job that compacts tombstones older than days
+        Returns the job, or None if it could not be queued
+        """
+        try:
+            job = JobService.enqueue(
+                ShopListService.COMPACT_TOMBSTONES_JOB, {"days": days}
+            )
+            db.session.commit()
+            return job
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error queueing tombstone compaction: {e}")
+            return None
+
     @staticmethod
     def delete_shop_list(shop_list_id):
         """
         Delete a shop list and all its associated data (products and shares)
+        The database removes the children through ON DELETE CASCADE, so they
+        are never loaded. With SOFT_DELETE_LISTS the list is only marked as
+        deleted and a background job purges its rows
         Returns True if successful, False otherwise
         """
         shop_list = ShopListService.get_shop_list_by_id(shop_list_id)
@@ -163,14 +913,98 @@ class ShopListService:
             return False
 
         try:
-            db.session.delete(shop_list)
+            if current_app.config.get("SOFT_DELETE_LISTS"):
+                shop_list.deleted_at = datetime.utcnow()
+                JobService.enqueue(
+                    ShopListService.PURGE_JOB,
+                    {"shopListId": shop_list_id},
+                    owner_id=shop_list.owner_id,
+                )
+            else:
+                db.session.delete(shop_list)
+            document_cache.invalidate(shop_list_id)
+            event_bus.publish(shop_list_id, "list.deleted")
             db.session.commit()
+            ShopListService._forget_access(shop_list_id)
             return True
         except Exception as e:
             db.session.rollback()
             print(f"Error deleting shop list: {e}")
             return False
 
+    @staticmethod
+    def purge_deleted_shop_lists(batch_size=1000):
+        """
+        Remove soft-deleted shop lists together with their products, shares
+        and tombstones
+        Children are deleted at most batch_size rows per transaction, so a
+        large list never holds locks for long
+        Returns the number of lists purged
+        """
+        shop_list_ids = (
+            db.session.execute(
+                select(ShopList.id).where(ShopList.deleted_at.is_not(None))
+            )
+            .scalars()
+            .all()
+        )
+
+        purged = 0
+        for shop_list_id in shop_list_ids:
+            if ShopListService.purge_shop_list(shop_list_id, batch_size):
+                purged += 1
+
+        return purged
+
+    @staticmethod
+    def purge_shop_list(shop_list_id, batch_size=1000):
+        """
+        Remove a soft-deleted shop list and its children in batches
+        Lists that are not marked as deleted are left alone
+        Returns True if successful, False otherwise
+        """
+        try:
+            deleted = db.session.execute(
+                select(ShopList.id).where(
+                    ShopList.id == shop_list_id, ShopList.deleted_at.is_not(None)
+                )
+            ).scalar_one_or_none()
+            if deleted is None:
+                db.session.rollback()
+                return True
+
+            for model in (Product, ShopListShare, Tombstone):
+                ShopListService._delete_in_batches(
+                    model, model.shop_list_id == shop_list_id, batch_size
+                )
+            db.session.execute(
+                delete(ShopList)
+                .where(ShopList.id == shop_list_id)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            return True
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error purging shop list {shop_list_id}: {e}")
+            return False
+
+    @staticmethod
+    def _delete_in_batches(model, condition, batch_size):
+        """
+        Delete the rows matching condition, committing after every batch
+        """
+        while True:
+            batch = select(model.id).where(condition).limit(batch_size)
+            result = db.session.execute(
+                delete(model)
+                .where(model.id.in_(batch))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            if result.rowcount < batch_size:
+                return
+
     @staticmethod
     def update_shop_list(shop_list_id, name):
         """
@@ -184,9 +1018,35 @@ class ShopListService:
         try:
             shop_list.name = name
             shop_list.updated_at = datetime.utcnow()
+            version = ShopListService.bump_version(shop_list_id)
+            document_cache.invalidate(shop_list_id)
+            event_bus.publish(shop_list_id, "list.updated", version, name=name)
             db.session.commit()
             return shop_list
         except Exception as e:
             db.session.rollback()
             print(f"Error updating shop list: {e}")
             return None
+
+
+def _run_share_job(payload):
+    return ShopListService.share_shop_list(
+        payload["shopListId"], payload["usernames"], payload["access"]
+    )
+
+
+def _run_purge_job(payload):
+    batch_size = current_app.config.get("LIST_PURGE_BATCH_SIZE", 1000)
+    if not ShopListService.purge_shop_list(payload["shopListId"], batch_size):
+        raise RuntimeError(f"Failed to purge shop list {payload['shopListId']}")
+
+
+def _run_compact_tombstones_job(payload):
+    return ShopListService.compact_tombstones(
+        datetime.utcnow() - timedelta(days=payload["days"])
+    )
+
+
+JobService.register(ShopListService.SHARE_JOB, _run_share_job)
+JobService.register(ShopListService.PURGE_JOB, _run_purge_job)
+JobService.register(ShopListService.COMPACT_TOMBSTONES_JOB, _run_compact_tombstones_job)
@@ -0,0 +1,48 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db
+
+
+def supports_returning(kind):
+    """
+    Whether the bound database supports RETURNING for the statement kind
+    (insert_executemany, update or delete)
+    """
+    dialect = db.session.get_bind().dialect
+    return getattr(dialect, f"{kind}_returning", False)
+
+
+def upsert_insert(model):
+    """
+    Build an INSERT for the model that supports on_conflict_do_update
+    Returns None if the bound database has no native upsert
+    """
+    dialect_name = db.session.get_bind().dialect.name
+
+    if dialect_name == "postgresql":
+        return postgresql.insert(model)
+
+    if dialect_name == "sqlite":
+        return sqlite.insert(model)
+
+    return None
+
+
+def supports_copy():
+    """
+    Whether rows can be bulk loaded with COPY, on PostgreSQL through psycopg 3
+    """
+    dialect = db.session.get_bind().dialect
+    return dialect.name == "postgresql" and dialect.driver == "psycopg"
+
+
+def copy_rows(table, columns, rows):
+    """
+    Load rows into a table with COPY FROM STDIN, inside the transaction of
+    the current session
+    """
+    connection = db.session.connection().connection.driver_connection
+    statement = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN"
+    with connection.cursor() as cursor:
+        with cursor.copy(statement) as copy:
+            for row in rows:
+                copy.write_row(row)
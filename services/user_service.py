@@ -1,5 +1,7 @@
 from models.user import User
 from models import db
+from services.password_hasher import PasswordHasherBusy
+from services.identity import identity_cache
 
 
 class UserService:
@@ -21,19 +23,55 @@ class UserService:
     def get_user_by_id(user_id):
         return User.query.get(user_id)
 
+    @staticmethod
+    def get_user_identity(user_id):
+        """
+        Get the {"id", "username"} record of a user, served from the
+        identity cache when possible
+        Returns None if the user does not exist
+        """
+        return identity_cache.resolve(user_id)
+
     @staticmethod
     def get_user_by_username(username):
         return User.query.filter_by(username=username).first()
 
+    @staticmethod
+    def get_users_by_usernames(usernames):
+        """
+        Get many users with a single query
+        Returns a dict mapping each found username to its user
+        """
+        usernames = [
+            username for username in set(usernames) if isinstance(username, str)
+        ]
+        if not usernames:
+            return {}
+
+        users = User.query.filter(User.username.in_(usernames)).all()
+        return {user.username: user for user in users}
+
     @staticmethod
     def authenticate_user(username, password):
         """
         Authenticate a user by username and password
+        Hashes made with an outdated bcrypt cost are upgraded on success
         Returns the user if authentication succeeds, None otherwise
         """
         user = UserService.get_user_by_username(username)
 
-        if user and user.check_password(password):
-            return user
+        if not user or not user.check_password(password):
+            return None
+
+        if user.password_needs_rehash():
+            try:
+                user.set_password(password)
+                db.session.commit()
+            except PasswordHasherBusy:
+                db.session.rollback()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error upgrading password hash: {e}")
 
-        return None
+        identity_cache.remember(user.to_dict())
+        return user
@@ -0,0 +1,72 @@
+import pytest
+from app import create_app
+from config import Config
+from models import db
+
+
+class TestConfig(Config):
+    TESTING = True
+    SECRET_KEY = "test-secret-key"
+    DATABASE_REPLICA_URLS = []
+    MIGRATIONS_ENABLED = False
+    WORKER_PROCESSES = 1
+    WORKER_THREADS = 1
+    BCRYPT_ROUNDS = 4
+    EVENTS_BACKEND = "memory"
+    QUERY_DEBUG = True
+    QUERY_BUDGET = None
+    METRICS_ENABLED = False
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """
+    Build apps on a fresh file-backed SQLite database, so threads share it
+    Keyword arguments override TestConfig settings
+    """
+    apps = []
+
+    def make(**overrides):
+        overrides.setdefault(
+            "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'test.db'}"
+        )
+        app = create_app(type("AppConfig", (TestConfig,), overrides))
+        with app.app_context():
+            db.create_all()
+        apps.append(app)
+        return app
+
+    yield make
+
+    for app in apps:
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(app):
+    """
+    Register a user and log them in on a test client
+    Returns the user ID
+    """
+
+    def log_in(client, username, password="password"):
+        client.post("/api/register", json={"username": username, "password": password})
+        response = client.post(
+            "/api/login", json={"username": username, "password": password}
+        )
+        assert response.status_code == 200, response.get_json()
+        return response.get_json()["id"]
+
+    return log_in
@@ -0,0 +1,57 @@
+import threading
+import time
+import pytest
+from services.password_hasher import PasswordHasherBusy, password_hasher
+
+
+def _saturate(count):
+    """
+    Occupy count hashing slots until the returned event is set
+    """
+    release = threading.Event()
+    threads = [
+        threading.Thread(target=password_hasher._run, args=(release.wait,))
+        for _ in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+
+    deadline = time.monotonic() + 5
+    while password_hasher.pending < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert password_hasher.pending == count
+    return release, threads
+
+
+def test_admission_keeps_a_request_thread_free(make_app):
+    make_app(WORKER_THREADS=4, PASSWORD_HASH_WORKERS=2, PASSWORD_HASH_QUEUE_SIZE=8)
+
+    assert password_hasher.admission_limit == 3
+
+
+def test_login_burst_gets_503_before_request_threads_run_out(make_app, login):
+    app = make_app(
+        WORKER_THREADS=4, PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_RETRY_AFTER=2
+    )
+    client = app.test_client()
+    login(client, "alice")
+
+    release, threads = _saturate(password_hasher.admission_limit)
+    try:
+        with pytest.raises(PasswordHasherBusy):
+            password_hasher.hash("password")
+
+        response = client.post(
+            "/api/login", json={"username": "alice", "password": "password"}
+        )
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "2"
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    response = client.post(
+        "/api/login", json={"username": "alice", "password": "password"}
+    )
+    assert response.status_code == 200
@@ -0,0 +1,107 @@
+from sqlalchemy import event
+from models import db
+from models.job import Job
+from services.product_service import ProductService
+
+
+def _add_products(client, shop_list_id, count):
+    response = client.post(
+        f"/api/shoplists/{shop_list_id}/products/batch",
+        json={"create": [{"name": f"p{i}"} for i in range(count)]},
+    )
+    return [result["product"]["id"] for result in response.get_json()["create"]]
+
+
+def _names(client, shop_list_id):
+    response = client.get(f"/api/shoplists/{shop_list_id}/products")
+    return [product["name"] for product in response.get_json()]
+
+
+def _move(client, shop_list_id, product_id, after_id):
+    return client.post(
+        f"/api/shoplists/{shop_list_id}/products/{product_id}/move",
+        json={"after": after_id},
+    )
+
+
+def test_move_updates_one_product_row(app, client, login):
+    login(client, "alice")
+    shop_list_id = client.post("/api/shoplists", json={"name": "L"}).get_json()["id"]
+    ids = _add_products(client, shop_list_id, 4)
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = _move(client, shop_list_id, ids[3], None)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    assert "rank" not in response.get_json()
+    assert len([s for s in statements if s.startswith("UPDATE products")]) == 1
+    assert _names(client, shop_list_id) == ["p3", "p0", "p1", "p2"]
+
+    assert _move(client, shop_list_id, ids[0], ids[2]).status_code == 200
+    assert _names(client, shop_list_id) == ["p3", "p1", "p2", "p0"]
+
+    changes = client.get(f"/api/shoplists/{shop_list_id}/changes").get_json()
+    ranks = [product["rank"] for product in changes["products"]]
+    assert ranks == sorted(ranks)
+
+
+def test_hot_spot_moves_queue_one_rebalance_at_a_time(make_app, login):
+    app = make_app(RANK_MAX_LENGTH=8)
+    client = app.test_client()
+    login(client, "alice")
+    shop_list_id = client.post("/api/shoplists", json={"name": "L"}).get_json()["id"]
+    ids = _add_products(client, shop_list_id, 3)
+
+    # Keep moving the last product between the first two
+    order = list(ids)
+    for _ in range(60):
+        assert _move(client, shop_list_id, order[-1], order[0]).status_code == 200
+        order.insert(1, order.pop())
+
+    with app.app_context():
+        jobs = Job.query.filter_by(kind=ProductService.REBALANCE_JOB).all()
+        assert len(jobs) == 1
+
+        # A failed job no longer counts as pending, the next long move queues
+        # another one
+        jobs[0].status = Job.FAILED
+        db.session.commit()
+
+    assert _move(client, shop_list_id, order[-1], order[0]).status_code == 200
+    order.insert(1, order.pop())
+
+    with app.app_context():
+        assert Job.query.filter_by(kind=ProductService.REBALANCE_JOB).count() == 2
+        assert ProductService.rebalance_ranks(shop_list_id) == 3
+
+    names = {product_id: f"p{i}" for i, product_id in enumerate(ids)}
+    assert _names(client, shop_list_id) == [names[i] for i in order]
+
+
+def test_moves_never_outgrow_the_rank_column(make_app, login):
+    # No worker runs, so only the inline rebalance keeps ranks short
+    app = make_app(RANK_MAX_LENGTH=8)
+    client = app.test_client()
+    login(client, "alice")
+    shop_list_id = client.post("/api/shoplists", json={"name": "L"}).get_json()["id"]
+    ids = _add_products(client, shop_list_id, 3)
+
+    order = list(ids)
+    for _ in range(1500):
+        assert _move(client, shop_list_id, order[-1], order[0]).status_code == 200
+        order.insert(1, order.pop())
+
+    changes = client.get(f"/api/shoplists/{shop_list_id}/changes").get_json()
+    assert max(len(product["rank"]) for product in changes["products"]) <= 255
+    names = {product_id: f"p{i}" for i, product_id in enumerate(ids)}
+    assert _names(client, shop_list_id) == [names[i] for i in order]
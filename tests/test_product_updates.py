@@ -0,0 +1,147 @@
+import threading
+from sqlalchemy import event
+from models import db
+from services.product_service import ProductService
+
+THREADS = 4
+TOGGLES_PER_THREAD = 30
+
+
+def test_concurrent_toggles_are_not_lost(app, client, login):
+    user_id = login(client, "alice")
+    shop_list_id = client.post("/api/shoplists", json={"name": "L"}).get_json()["id"]
+    product_id = client.post(
+        f"/api/shoplists/{shop_list_id}/products", json={"name": "milk"}
+    ).get_json()["id"]
+
+    results = []
+    errors = []
+    statements = []
+    start = threading.Barrier(THREADS)
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    def toggle():
+        start.wait()
+        for _ in range(TOGGLES_PER_THREAD):
+            with app.app_context():
+                product = ProductService.toggle_product_strikeout(product_id, user_id)
+                if product is None:
+                    errors.append(product_id)
+                else:
+                    results.append((product.version, product.strikeout))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        threads = [threading.Thread(target=toggle) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert errors == []
+    assert len(results) == THREADS * TOGGLES_PER_THREAD
+
+    # One UPDATE flips the product, one bumps the list with the open count
+    assert len(statements) == 2 * len(results)
+    assert sum(s.startswith("UPDATE products") for s in statements) == len(results)
+
+    # Every toggle got its own list version and flipped the value the
+    # previous toggle left, so the values alternate in version order
+    results.sort()
+    versions = [version for version, _ in results]
+    assert len(set(versions)) == len(versions)
+    assert [strikeout for _, strikeout in results] == [
+        index % 2 == 0 for index in range(len(results))
+    ]
+
+    product = client.get(f"/api/shoplists/{shop_list_id}/products").get_json()[0]
+    assert product["strikeout"] is False
+
+
+def test_batch_reports_invalid_items_and_applies_the_rest(client, login):
+    login(client, "alice")
+    shop_list_id = client.post("/api/shoplists", json={"name": "L"}).get_json()["id"]
+    url = f"/api/shoplists/{shop_list_id}/products"
+    milk, bread = (
+        client.post(url, json={"name": name}).get_json()["id"]
+        for name in ("milk", "bread")
+    )
+    client.post(f"{url}/batch", json={"update": [{"id": milk, "strikeout": True}]})
+
+    response = client.post(
+        f"{url}/batch",
+        json={
+            "create": [{"name": "x" * 101}, {"name": "eggs"}],
+            "update": [
+                {"id": milk, "name": "oat milk"},
+                {"id": bread, "strikeout": "yes"},
+                {"id": bread, "name": "y" * 101},
+            ],
+        },
+    )
+
+    assert response.status_code == 200
+    results = response.get_json()
+    assert [result["status"] for result in results["create"]] == [400, 201]
+    assert [result["status"] for result in results["update"]] == [200, 400, 400]
+    assert results["update"][1]["error"] == "Field strikeout must be true or false"
+
+    # A rename leaves the strikeout of the product as it was
+    products = {product["id"]: product for product in client.get(url).get_json()}
+    assert products[milk] == {"id": milk, "name": "oat milk", "strikeout": True}
+    assert products[bread]["name"] == "bread"
+    assert len(products) == 3
+
+
+def test_product_writes_keep_the_list_counters(app, client, login):
+    user_id = login(client, "alice")
+    shop_list_id = client.post("/api/shoplists", json={"name": "L"}).get_json()["id"]
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    def write(call, *args, **kwargs):
+        statements.clear()
+        with app.app_context():
+            result = call(*args, **kwargs)
+        return result, len(statements)
+
+    def counters():
+        summary = client.get("/api/shoplists/summary").get_json()[0]
+        return summary["productCount"], summary["openCount"]
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        milk, count = write(ProductService.add_product, shop_list_id, "milk")
+        assert count == 3
+        write(ProductService.add_product, shop_list_id, "bread")
+        assert counters() == (2, 2)
+
+        # The open count follows the strikeout the product write returns,
+        # the list bump carries the change
+        update = ProductService.update_product
+        assert write(update, milk.id, strikeout=True, user_id=user_id)[1] == 2
+        assert counters() == (2, 1)
+        assert write(update, milk.id, name="oat milk", user_id=user_id)[1] == 2
+        write(update, milk.id, name="milk", strikeout=True, user_id=user_id)
+        assert counters() == (2, 1)
+        write(ProductService.toggle_product_strikeout, milk.id, user_id)
+        assert counters() == (2, 2)
+        write(ProductService.toggle_product_strikeout, milk.id, user_id)
+
+        deleted, count = write(ProductService.delete_product, milk.id, user_id)
+        assert deleted is True
+        assert count == 3
+        assert counters() == (1, 1)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
@@ -0,0 +1,124 @@
+import json
+from flask.json.provider import DefaultJSONProvider
+from json_provider import OrjsonProvider
+from models.shop_list import ShopList
+
+
+def _create_lists(client, count, products=3, share_with=()):
+    for index in range(count):
+        shop_list_id = client.post(
+            "/api/shoplists", json={"name": f"list {index}"}
+        ).get_json()["id"]
+        client.post(
+            f"/api/shoplists/{shop_list_id}/products/batch",
+            json={"create": [{"name": f"product {i}"} for i in range(products)]},
+        )
+        if share_with:
+            client.post(
+                f"/api/shoplists/{shop_list_id}/share",
+                json={"users": list(share_with), "access": 1},
+            )
+
+
+def _query_count(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return int(response.headers["X-Query-Count"])
+
+
+def test_get_shop_lists_query_count_does_not_grow_with_lists(make_app, login):
+    app = make_app(DOCUMENT_CACHE_ENABLED=False)
+    owner = app.test_client()
+    other = app.test_client()
+    login(other, "other")
+    login(owner, "owner")
+    for name in ("friend1", "friend2"):
+        login(app.test_client(), name)
+
+    # Lists the user owns and lists shared with them, with shares of their own
+    _create_lists(owner, 1, share_with=("friend1", "friend2", "other"))
+    _create_lists(other, 1, share_with=("owner", "friend1"))
+    few = _query_count(owner, "/api/shoplists")
+
+    _create_lists(owner, 20, share_with=("friend1", "friend2", "other"))
+    _create_lists(other, 20, share_with=("owner", "friend1"))
+    many = _query_count(owner, "/api/shoplists")
+
+    assert many == few
+
+    # The budget makes the testing app raise if the endpoint ever exceeds it
+    app.config["QUERY_BUDGET"] = few
+    assert len(owner.get("/api/shoplists").get_json()) == 42
+
+
+def test_get_shop_lists_matches_orm_serialization(client, login):
+    user_id = login(client, "owner")
+    login(client.application.test_client(), "friend")
+    _create_lists(client, 3, share_with=("friend",))
+
+    response = client.get("/api/shoplists")
+
+    with client.application.app_context():
+        shop_lists = (
+            ShopList.query.filter_by(owner_id=user_id)
+            .order_by(ShopList.created_at)
+            .all()
+        )
+        expected = [shop_list.to_dict() for shop_list in shop_lists]
+        body = client.application.json.response(expected).get_data()
+
+    assert response.get_data() == body
+    assert json.loads(body)[0]["sharedWith"] == [{"username": "friend", "access": 1}]
+
+
+def test_document_cache_counters_are_exported(make_app, login):
+    app = make_app(METRICS_ENABLED=True, DOCUMENT_CACHE_MAX_ENTRIES=1)
+    client = app.test_client()
+    login(client, "owner")
+    first, second = (
+        client.post("/api/shoplists", json={"name": name}).get_json()["id"]
+        for name in ("first", "second")
+    )
+
+    def exported():
+        body = client.get("/metrics").get_data(as_text=True)
+        samples = {}
+        for line in body.splitlines():
+            if line.startswith("document_cache_"):
+                name, value = line.rsplit(" ", 1)
+                samples[name] = float(value)
+        return samples
+
+    before = exported()
+    client.get(f"/api/shoplists/{first}")
+    client.get(f"/api/shoplists/{first}")
+    # The cache holds one document, so caching the second evicts the first
+    client.get(f"/api/shoplists/{second}")
+    after = exported()
+
+    def delta(name):
+        return after.get(name, 0) - before.get(name, 0)
+
+    assert delta('document_cache_lookups_total{result="hit"}') == 1
+    assert delta('document_cache_lookups_total{result="miss"}') == 2
+    assert delta("document_cache_evictions_total") == 1
+
+
+def test_orjson_provider_matches_stdlib_output(make_app, login):
+    app = make_app(JSON_PROVIDER="orjson", DOCUMENT_CACHE_ENABLED=False)
+    client = app.test_client()
+    login(client, "owner")
+    for name in ("Einkäufe", "Покупки", "買い物", "🛒 groceries", 'quote " \\ \n'):
+        shop_list_id = client.post("/api/shoplists", json={"name": name}).get_json()[
+            "id"
+        ]
+        client.post(f"/api/shoplists/{shop_list_id}/products", json={"name": name})
+
+    assert isinstance(app.json, OrjsonProvider)
+    orjson_body = client.get("/api/shoplists").get_data()
+    app.json = DefaultJSONProvider(app)
+    stdlib_body = client.get("/api/shoplists").get_data()
+
+    assert orjson_body == stdlib_body
+    assert stdlib_body.isascii()
+    assert json.loads(stdlib_body)[3]["products"][0]["name"] == "🛒 groceries"
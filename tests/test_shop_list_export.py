@@ -0,0 +1,50 @@
+import tracemalloc
+from sqlalchemy import insert
+from models import db
+from models.shop_list import Product
+from services.ranks import ranks_after
+
+LISTS = 20
+PRODUCTS_PER_LIST = 10_000
+
+
+def _peak_memory(client, url):
+    """
+    Read a response to the end, returns its size and the peak of memory
+    allocated meanwhile
+    """
+    tracemalloc.start()
+    try:
+        response = client.get(url, buffered=False)
+        size = sum(len(chunk) for chunk in response.response)
+        response.close()
+        return size, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_streamed_export_memory_does_not_grow_with_products(app, client, login):
+    login(client, "owner")
+    shop_list_ids = [
+        client.post("/api/shoplists", json={"name": f"list {index}"}).get_json()["id"]
+        for index in range(LISTS)
+    ]
+
+    with app.app_context():
+        ranks = ranks_after(None, PRODUCTS_PER_LIST)
+        for shop_list_id in shop_list_ids:
+            db.session.execute(
+                insert(Product),
+                [
+                    {"shop_list_id": shop_list_id, "name": f"product {i}", "rank": rank}
+                    for i, rank in enumerate(ranks)
+                ],
+            )
+        db.session.commit()
+
+    size, peak = _peak_memory(client, "/api/shoplists?stream=true")
+
+    # The buffered response holds every document plus the encoded body, the
+    # stream only the current rows and one chunk
+    assert size > 10 * 1024 * 1024
+    assert peak < 4 * 1024 * 1024
@@ -0,0 +1,63 @@
+from models.shop_list import ShopListShare
+
+
+def _register(app, count, offset=0):
+    usernames = [f"user{index}" for index in range(offset, offset + count)]
+    for username in usernames:
+        client = app.test_client()
+        client.post("/api/register", json={"username": username, "password": "pw"})
+    return usernames
+
+
+def _query_count(response):
+    assert response.status_code == 200, response.get_json()
+    return int(response.headers["X-Query-Count"])
+
+
+def _share_and_unshare(owner, usernames):
+    shop_list_id = owner.post("/api/shoplists", json={"name": "L"}).get_json()["id"]
+    shared = owner.post(
+        f"/api/shoplists/{shop_list_id}/share",
+        json={"users": usernames, "access": 1},
+    )
+    assert len(shared.get_json()) == len(usernames)
+    unshared = owner.post(
+        f"/api/shoplists/{shop_list_id}/unshare", json={"users": usernames}
+    )
+    assert len(unshared.get_json()) == len(usernames)
+    return _query_count(shared), _query_count(unshared)
+
+
+def test_share_query_count_does_not_grow_with_users(app, client, login):
+    login(client, "owner")
+    few = _share_and_unshare(client, _register(app, 2))
+    many = _share_and_unshare(client, _register(app, 40, offset=2))
+
+    assert many == few
+
+
+def test_shares_created_together_keep_a_stable_order(app, client, login):
+    login(client, "owner")
+    usernames = _register(app, 20)
+    shop_list_id = client.post("/api/shoplists", json={"name": "L"}).get_json()["id"]
+    client.post(
+        f"/api/shoplists/{shop_list_id}/share",
+        json={"users": usernames, "access": 1},
+    )
+
+    # The shares of one request have the same created_at, so the listing,
+    # the single list document and the stream must all break ties alike
+    listed = client.get("/api/shoplists").get_json()[0]["sharedWith"]
+    single = client.get(f"/api/shoplists/{shop_list_id}").get_json()["sharedWith"]
+    streamed = client.get("/api/shoplists?stream=true").get_json()[0]["sharedWith"]
+
+    with app.app_context():
+        expected = [
+            share.user.username
+            for share in ShopListShare.query.filter_by(shop_list_id=shop_list_id)
+            .order_by(ShopListShare.id)
+            .all()
+        ]
+
+    assert listed == single == streamed
+    assert [share["username"] for share in listed] == expected